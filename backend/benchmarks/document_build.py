@@ -0,0 +1,77 @@
+"""Rows per second of index document construction, before and after vectorization
+
+Compares the previous per-row builder (df.iterrows() + pydantic Place + f-string +
+model_dump()) with PlacesEmbeddingsGenerator._create_documents, and checks that both
+render byte-identical document texts and metadata. Run from the backend directory:
+
+    python benchmarks/document_build.py --scale 10
+"""
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def legacy_create_documents(df: pd.DataFrame):
+    """The row by row builder this benchmark measures against"""
+    from controller.rag import Place
+    documents = []
+    for _, row in df.iterrows():
+        place = Place(
+            id=str(row['id']),
+            display_name=row['displayName'],
+            formatted_address=row['formattedAddress'],
+            lat=float(row['lat']),
+            lng=float(row['lng']),
+            types=row['types'] if pd.notnull(row['types']) else None,
+            rating=row['rating'] if pd.notnull(row['rating']) else None,
+            user_rating_count=int(row['userRatingCount']) if pd.notnull(row['userRatingCount']) else None,
+            city=row['city'],
+            main_category=row['main_category']
+        )
+
+        content = f"""
+            Name: {place.display_name}
+            Address: {place.formatted_address}
+            City: {place.city}
+            main_category: {place.main_category}
+            Type: {place.types if place.types else 'Not specified'}
+            Rating: {place.rating if place.rating else 'No rating'} ({place.user_rating_count if place.user_rating_count else 0} reviews)
+            """
+        documents.append((content, place.model_dump()))
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="controller/final_df.csv")
+    parser.add_argument("--scale", type=int, default=1, help="repeat the dataset this many times")
+    args = parser.parse_args()
+
+    from controller.rag import PlacesEmbeddingsGenerator
+    df = pd.concat([pd.read_csv(args.csv)] * args.scale, ignore_index=True)
+
+    start = time.perf_counter()
+    legacy = legacy_create_documents(df)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    contents, places = PlacesEmbeddingsGenerator._create_documents(df)
+    columnar_seconds = time.perf_counter() - start
+
+    identical = (
+        [content for content, _ in legacy] == contents
+        and all(metadata == places.get(row_id) for row_id, (_, metadata) in enumerate(legacy))
+    )
+    print(f"{len(df)} rows")
+    print(f"iterrows + pydantic: {legacy_seconds:.3f}s, {len(df) / legacy_seconds:,.0f} rows/s")
+    print(f"columnar:            {columnar_seconds:.3f}s, {len(df) / columnar_seconds:,.0f} rows/s")
+    print(f"speedup:             {legacy_seconds / columnar_seconds:.1f}x")
+    print(f"identical output:    {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Recall / latency / memory report for the places index types
+
+Compares the compressed index types (fp16, sq8, pq with exact re-rank) against the
+exact flat index published by build_index.py. Run from the backend directory:
+
+    python benchmarks/index_modes.py --k 10 --queries 500 --output benchmarks/index_modes_report.md
+
+Queries are place vectors sampled from the index plus gaussian noise of norm
+--noise, so no query is itself a point of the index (a stored vector is its own
+nearest neighbour under every codec, which would inflate recall). Half of them are
+searched with the city filter of a random place. Each index type is measured in a
+fresh process so the resident memory numbers do not leak into each other.
+"""
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INDEX_TYPES = ["flat", "fp16", "sq8", "pq"]
+
+
+def _rss_mb() -> float:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+def _run(index_path: str, index_type: str, queries: np.ndarray, filters: list, k: int) -> dict:
+    from controller.vector_index import PlacesVectorIndex
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    index = PlacesVectorIndex(index_path, index_type=index_type)
+    open_seconds = time.perf_counter() - start
+
+    results, latencies = [], []
+    for query, search_filter in zip(queries, filters):
+        start = time.perf_counter()
+        hits = index.search(query, k=k, filter=search_filter)
+        latencies.append(time.perf_counter() - start)
+        results.append([row_id for row_id, _ in hits])
+
+    return {
+        "index_type": index_type,
+        "results": results,
+        "open_ms": open_seconds * 1000,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p99_ms": float(np.percentile(latencies, 99)) * 1000,
+        "rss_mb": _rss_mb() - rss_before,
+        "codes_mb": (index.codec.nbytes if index.codec else index.vectors.nbytes) / 2**20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings-dir", default="controller/embeddings")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--noise", type=float, default=0.5,
+                        help="norm of the noise added to each unit length sampled vector")
+    parser.add_argument("--output", default=None, help="write the markdown report to this file")
+    args = parser.parse_args()
+
+    from controller.rag import PlacesEmbeddingsGenerator
+    from controller.vector_index import PlacesVectorIndex
+
+    generator = PlacesEmbeddingsGenerator(args.embeddings_dir)
+    index_path = generator.get_published_index_path()
+    if index_path is None:
+        sys.exit(f"No published index in {args.embeddings_dir}, run build_index.py first")
+
+    flat = PlacesVectorIndex(index_path)
+    rng = np.random.default_rng(args.seed)
+    rows = rng.choice(len(flat), size=min(args.queries, len(flat)), replace=False)
+    queries = np.asarray(flat.vectors[np.sort(rows)], dtype=np.float32)
+    noise = rng.standard_normal(queries.shape).astype(np.float32)
+    queries = queries + args.noise * noise / np.linalg.norm(noise, axis=1, keepdims=True)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    cities = flat.places.column('city')
+    filters = [
+        {'city': cities[int(rng.integers(len(flat)))]} if i % 2 else None
+        for i in range(len(queries))
+    ]
+    truth = [[row_id for row_id, _ in flat.search(q, k=args.k, filter=f)] for q, f in zip(queries, filters)]
+
+    context = multiprocessing.get_context("spawn")
+    lines = [
+        f"# Index types on {flat.version}",
+        "",
+        f"{len(flat)} places, {flat.vectors.shape[1]} dimensions, {len(queries)} queries "
+        f"(sampled vectors + noise of norm {args.noise}, half city filtered), k={args.k}",
+        "",
+        "| index type | recall@k | p50 ms | p99 ms | open ms | codes MB | RSS growth MB |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for index_type in INDEX_TYPES:
+        with context.Pool(1) as pool:
+            stats = pool.apply(_run, (index_path, index_type, queries, filters, args.k))
+        recall = np.mean([
+            len(set(found) & set(expected)) / max(len(expected), 1)
+            for found, expected in zip(stats["results"], truth)
+        ])
+        lines.append(
+            f"| {index_type} | {recall:.4f} | {stats['p50_ms']:.2f} | {stats['p99_ms']:.2f} | "
+            f"{stats['open_ms']:.1f} | {stats['codes_mb']:.1f} | {stats['rss_mb']:.1f} |")
+
+    report = "\n".join(lines) + "\n"
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
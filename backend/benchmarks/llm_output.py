@@ -0,0 +1,144 @@
+"""Output tokens and latency of the answer prompt, before and after place hydration
+
+Before, gpt-4o re-emitted every field of every place it recommended; now it returns
+only the message, the chosen place ids and the filters, and the server fills in
+the records (RAGPipeline._hydrate). Both prompts answer the same queries over the
+same retrieved places. Run from the backend directory after build_index.py, with
+OPENAI_API_KEY set (every query costs two gpt-4o calls):
+
+    python benchmarks/llm_output.py --queries 20 --output benchmarks/llm_output_report.md
+
+"invented" counts places of the full record answers whose id is not among the
+retrieved places, or whose coordinates or rating differ from the place data.
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUERIES = [
+    "good hotels in Murree", "biryani places in Karachi", "family friendly parks in Lahore",
+    "quiet cafes in Islamabad to work from", "best mosques to visit in Lahore", "cheap guest houses in Peshawar",
+    "rooftop restaurants in Lahore", "bbq in Rawalpindi", "historic places in Multan", "hotels near the beach in Karachi",
+    "places for breakfast in Faisalabad", "top rated restaurants in Quetta", "museums in Lahore",
+    "where can I eat karahi in Peshawar", "resorts in Nathia Gali", "masjid near saddar Rawalpindi",
+    "fast food in Sialkot", "gardens in Hyderabad", "steakhouse in Karachi", "lodges in Abbottabad",
+]
+
+# Response sections of the prompt before hydration, the rest of the prompt is the
+# production one (RAGPipeline.build_response_template)
+LEGACY_RESPONSE_RULES = """            ### **Response Rules**:
+            1. **If places are available**, return up to {n_places}, prioritizing higher ratings and review counts.
+            2. **If no places match**, return an empty `"places"` list with an appropriate `"message"`. **Do not generate fake places.**
+            3. **Do not assume information**—base responses strictly on provided data.
+
+"""
+LEGACY_RESPONSE_FORMAT = """            ### **Response Format**:
+            ```json
+                {{  
+                "message": "Conversational response explaining results",  
+                "places": [  
+                    {{  
+                        "place_id": "unique identifier",  
+                        "name": "place name",  
+                        "address": "full address",  
+                        "lat": float | null,  
+                        "lng": float | null,  
+                        "city": "city name",  
+                        "main_category": "public places | restaurants | hotels | mosques or masjid",  
+                        "types": "comma-separated subcategories | null",  
+                        "rating": float | null,  
+                        "review_count": int | null  
+                    }}  
+                ],  
+                "context": "Relevant prior conversation context",  
+                "applied_filters": {{  
+                    "city": "string | null",  
+                    "main_category": "string | null",  
+                    "types": "string | null",  
+                    "min_rating": float | null  
+                }},  
+                "filter_action": "update | clear | keep"  
+            }}    
+
+"""
+
+
+def _invented(places: list, candidates: dict) -> int:
+    count = 0
+    for place in places:
+        record = candidates.get(place.get('place_id'))
+        if record is None or any(
+                place.get(field) is not None and record[field] is not None and abs(place[field] - record[field]) > 1e-6
+                for field in ('lat', 'lng', 'rating')):
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="controller/final_df.csv")
+    parser.add_argument("--embeddings-dir", default="controller/embeddings")
+    parser.add_argument("--queries", type=int, default=len(QUERIES), help="number of sample queries to run")
+    parser.add_argument("--n-places", type=int, default=5)
+    parser.add_argument("--output", default=None, help="write the markdown report to this file")
+    args = parser.parse_args()
+
+    from config import settings
+    from langchain_core.utils.json import parse_json_markdown
+    from controller.rag import RAGPipeline
+
+    if not settings.OPENAI_API_KEY:
+        sys.exit("OPENAI_API_KEY is not set")
+    rag = RAGPipeline(csv_path=args.csv, openai_api_key=settings.OPENAI_API_KEY, embeddings_dir=args.embeddings_dir,
+                      allow_index_build=False, response_cache_size=0)
+    templates = {
+        "full records": RAGPipeline.build_response_template(LEGACY_RESPONSE_RULES, LEGACY_RESPONSE_FORMAT),
+        "place ids": rag.response_template,
+    }
+    results = {name: {"tokens": [], "seconds": [], "invented": 0, "places": 0} for name in templates}
+
+    for position, query in enumerate(QUERIES[:args.queries]):
+        filters = rag._validate_and_extract_filters(query, {})
+        docs = rag.search_places(query, filters, k=args.n_places)
+        candidates = {doc.metadata['id']: doc.metadata for doc in docs}
+        inputs = rag.prompt_inputs(query, docs, [], filters, args.n_places)
+        # Alternate which prompt goes first so neither profits from a warmer connection
+        names = list(templates) if position % 2 == 0 else list(reversed(templates))
+        for name in names:
+            start = time.perf_counter()
+            message = (templates[name] | rag.llm).invoke(inputs)
+            result = results[name]
+            result["seconds"].append(time.perf_counter() - start)
+            result["tokens"].append((message.usage_metadata or {}).get("output_tokens", 0))
+            answer = parse_json_markdown(message.content)
+            if name == "full records":
+                result["places"] += len(answer.get("places") or [])
+                result["invented"] += _invented(answer.get("places") or [], candidates)
+            else:
+                result["places"] += len(answer.get("place_ids") or [])
+                result["invented"] += sum(place_id not in candidates for place_id in answer.get("place_ids") or [])
+        print(query, {name: result["tokens"][-1] for name, result in results.items()})
+
+    lines = [
+        f"# Answer output, {len(results['place ids']['tokens'])} queries, n_places={args.n_places}",
+        "",
+        "| prompt | mean output tokens | p50 latency ms | p90 latency ms | places | invented |",
+        "|---|---|---|---|---|---|",
+    ]
+    for name, result in results.items():
+        lines.append(
+            f"| {name} | {np.mean(result['tokens']):.0f} | {np.percentile(result['seconds'], 50) * 1000:.0f} "
+            f"| {np.percentile(result['seconds'], 90) * 1000:.0f} | {result['places']} | {result['invented']} |")
+    report = "\n".join(lines) + "\n"
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
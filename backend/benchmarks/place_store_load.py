@@ -0,0 +1,78 @@
+"""Open time of the original pickled FAISS store against a published index version
+
+The original format is the LangChain FAISS directory saved by FAISS.save_local
+(places_embeddings_<md5>): a faiss index plus a pickled docstore holding one
+Document per place. A published version memory-maps its vectors.npy and binary
+place store instead. Both are opened here, and the benchmark checks they hold the
+same places. Run from the backend directory after build_index.py:
+
+    python benchmarks/place_store_load.py --legacy controller/embeddings/places_embeddings_<md5>
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _time(load, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        loaded = load()
+        timings.append(time.perf_counter() - start)
+    return loaded, min(timings) * 1000
+
+
+def _same(legacy: dict, other: dict) -> bool:
+    for field, value in legacy.items():
+        if isinstance(value, float) and isinstance(other.get(field), float):
+            if abs(value - other[field]) > 1e-9:
+                return False
+        elif value != other.get(field):
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings-dir", default="controller/embeddings")
+    parser.add_argument("--legacy", required=True, help="places_embeddings_<md5> directory saved by FAISS.save_local")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    import numpy as np
+    from langchain_community.vectorstores import FAISS
+    from controller.place_store import PlaceStore
+    from controller.vector_index import PLACES_DIR, VECTORS_FILE
+    from controller.rag import PlacesEmbeddingsGenerator
+
+    generator = PlacesEmbeddingsGenerator(args.embeddings_dir)
+    index_path = generator.get_published_index_path()
+    if index_path is None:
+        sys.exit(f"No published index in {args.embeddings_dir}, run build_index.py first")
+
+    # Loading only keeps the embeddings object, no embedding call is made
+    legacy, legacy_ms = _time(
+        lambda: FAISS.load_local(args.legacy, generator.embeddings, allow_dangerous_deserialization=True), args.repeat)
+    (vectors, binary), binary_ms = _time(
+        lambda: (np.load(os.path.join(index_path, VECTORS_FILE), mmap_mode='r'),
+                 PlaceStore.load(os.path.join(index_path, PLACES_DIR))),
+        args.repeat)
+
+    # Row order differs between the formats, compare by place id
+    places = [legacy.docstore.search(legacy.index_to_docstore_id[i]).metadata for i in range(legacy.index.ntotal)]
+    by_id = {binary.get(row_id)['id']: binary.get(row_id) for row_id in range(len(binary))}
+    missing = sum(place['id'] not in by_id for place in places)
+    same = sum(place['id'] in by_id and _same(place, by_id[place['id']]) for place in places)
+    print(f"FAISS.load_local {legacy.index.ntotal} places, {legacy_ms:.1f} ms")
+    print(f"published index  {vectors.shape[0]} places, {binary_ms:.1f} ms "
+          f"({legacy_ms / max(binary_ms, 1e-9):.0f}x faster)")
+    # Duplicate ids of the original store are merged into one place by the index build
+    print(f"identical places: {same}/{len(places)}, missing ids: {missing}, "
+          f"distinct ids in the original store: {len({place['id'] for place in places})}")
+
+
+if __name__ == "__main__":
+    main()
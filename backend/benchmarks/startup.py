@@ -0,0 +1,114 @@
+"""Startup time report: import cost per package and RAG pipeline initialization
+
+Every measurement runs in a fresh interpreter so module caches do not hide import
+cost. Run from the backend directory after build_index.py:
+
+    python benchmarks/startup.py --output benchmarks/startup_report.md --budget-ms 2000
+
+Sections:
+    imports  - `python -X importtime -c "import main"`, self time summed per top level
+               package, i.e. what a worker pays before it can serve /ready
+    entry points - wall time of importing main (API), models (alembic) and
+               controller.rag (first use of the pipeline)
+    pipeline - RAGPipeline construction split into its steps, index open included
+
+With --budget-ms the script exits with status 1 when importing main exceeds it.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PIPELINE_PROBE = """
+import json, time
+started = time.perf_counter()
+import controller.rag as rag
+imported = time.perf_counter()
+pipeline = rag.RAGPipeline(csv_path={csv!r}, openai_api_key='startup-benchmark', embeddings_dir={embeddings_dir!r},
+                           index_type={index_type!r}, allow_index_build=False)
+built = time.perf_counter()
+print(json.dumps({{
+    'import controller.rag': (imported - started) * 1000,
+    'RAGPipeline()': (built - imported) * 1000,
+    'index open steps': pipeline.vectorstore.open_timings,
+}}))
+"""
+
+
+def _run(code: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    env = {**os.environ, 'SECRET_KEY': os.environ.get('SECRET_KEY', 'startup-benchmark')}
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+    result = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"Probe failed:\n{result.stderr[-2000:]}")
+    return result
+
+
+def _import_ms(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+    return float(_run(code).stdout.strip().splitlines()[-1])
+
+
+def _import_profile(module: str) -> dict:
+    """Self import time in ms summed per top level package"""
+    stderr = _run(f"import {module}", importtime=True).stderr
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1000
+    return packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="controller/final_df.csv")
+    parser.add_argument("--embeddings-dir", default="controller/embeddings")
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--top", type=int, default=15, help="packages listed in the imports section")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail when importing main takes longer")
+    parser.add_argument("--skip-pipeline", action="store_true", help="only measure imports")
+    parser.add_argument("--output", default=None, help="write the markdown report to this file")
+    args = parser.parse_args()
+
+    packages = _import_profile("main")
+    total = sum(packages.values())
+    lines = [
+        "# Startup time",
+        "",
+        f"## imports of main ({total:.0f} ms self time)",
+        "",
+        "| package | ms | share |",
+        "|---|---|---|",
+    ]
+    for package, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        lines.append(f"| {package} | {ms:.1f} | {ms / max(total, 1e-9):.0%} |")
+
+    entry_points = {module: _import_ms(module) for module in ("main", "models", "controller.rag")}
+    lines += ["", "## entry points", "", "| import | ms |", "|---|---|"]
+    lines += [f"| {module} | {ms:.0f} |" for module, ms in entry_points.items()]
+
+    if not args.skip_pipeline:
+        probe = PIPELINE_PROBE.format(csv=args.csv, embeddings_dir=args.embeddings_dir, index_type=args.index_type)
+        steps = json.loads(_run(probe).stdout.strip().splitlines()[-1])
+        lines += ["", f"## pipeline ({args.index_type} index)", "", "| step | ms |", "|---|---|"]
+        lines += [f"| import controller.rag | {steps['import controller.rag']:.0f} |",
+                  f"| RAGPipeline() | {steps['RAGPipeline()']:.0f} |"]
+        lines += [f"| &nbsp;&nbsp;index open: {name} | {ms:.0f} |" for name, ms in steps['index open steps'].items()]
+
+    report = "\n".join(lines) + "\n"
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    if args.budget_ms is not None and entry_points["main"] > args.budget_ms:
+        sys.exit(f"import main took {entry_points['main']:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
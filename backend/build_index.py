@@ -0,0 +1,64 @@
+"""Build and publish a versioned places index
+
+Embeds the CSV (reusing every vector already in the document embeddings store),
+writes a read-only artifact under <embeddings-dir>/versions/<version>/ with the
+vectors, the memory-mapped place store, manifest.json and stats.json, then points
+CURRENT at it. Servers only open the published version, so run this whenever the dataset changes:
+
+    python build_index.py --csv controller/final_df.csv --codecs fp16,sq8,pq
+
+Nothing is rebuilt when the published version already matches the CSV, unless --force.
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings
+from controller.quantization import CODECS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="controller/final_df.csv")
+    parser.add_argument("--embeddings-dir", default="controller/embeddings")
+    parser.add_argument("--codecs", default=",".join(CODECS),
+                        help="comma separated compressed index types to encode, empty for flat only")
+    parser.add_argument("--chunk-size", type=int, default=500, help="documents per embedding request")
+    parser.add_argument("--concurrency", type=int, default=4, help="embedding requests in flight")
+    parser.add_argument("--import-legacy-pickle", action="store_true",
+                        help="reuse vectors of an old pickled FAISS store of this CSV (unpickles it, trusted files only)")
+    parser.add_argument("--force", action="store_true", help="build even if the published version is up to date")
+    parser.add_argument("--no-publish", action="store_true", help="build the version without pointing CURRENT at it")
+    args = parser.parse_args()
+
+    if not settings.OPENAI_API_KEY:
+        sys.exit("OPENAI_API_KEY is not set")
+    os.environ['OPENAI_API_KEY'] = settings.OPENAI_API_KEY
+
+    from controller import RAGError
+    from controller.rag import PlacesEmbeddingsGenerator
+    from controller.vector_index import STATS_FILE
+
+    codecs = [name for name in args.codecs.split(",") if name]
+    unknown = [name for name in codecs if name not in CODECS]
+    if unknown:
+        sys.exit(f"Unknown codecs: {', '.join(unknown)} (choose from {', '.join(CODECS)})")
+
+    generator = PlacesEmbeddingsGenerator(
+        args.embeddings_dir, build_chunk_size=args.chunk_size, build_concurrency=args.concurrency,
+        import_legacy_pickle=args.import_legacy_pickle)
+    try:
+        index_path = generator.build_index(args.csv, codecs=codecs, publish=not args.no_publish, force=args.force)
+    except RAGError as e:
+        sys.exit(f"Index build failed: {e.message}")
+
+    with open(os.path.join(index_path, STATS_FILE)) as f:
+        print(json.dumps(json.load(f), indent=2))
+    print(index_path)
+
+
+if __name__ == "__main__":
+    main()
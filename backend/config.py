@@ -19,6 +19,20 @@ class Settings:
     DB_NAME: str = os.getenv("DB_NAME", "tb_data_collection_db")
     DATABASE_URL = f"postgresql+psycopg://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
+    INDEX_TYPE: str = os.getenv("INDEX_TYPE", "flat")  # flat / fp16 / sq8 / pq
+    QUERY_CACHE_SIZE: int = int(os.getenv("QUERY_CACHE_SIZE", 10000))
+    QUERY_CACHE_TTL: float = float(os.getenv("QUERY_CACHE_TTL", 7 * 24 * 3600))  # seconds
+    QUERY_CACHE_PATH: str = os.getenv("QUERY_CACHE_PATH")  # sqlite file, unset = memory only
+    # Servers open the version published by build_index.py, set to build inline when none exists
+    INDEX_BUILD_ON_START: bool = os.getenv("INDEX_BUILD_ON_START", "false").lower() in ("1", "true", "yes")
+    INDEX_WATCH_INTERVAL: float = float(os.getenv("INDEX_WATCH_INTERVAL", 30))  # seconds, 0 = never hot-swap
+    INDEX_DRAIN_SECONDS: float = float(os.getenv("INDEX_DRAIN_SECONDS", 60))  # old version kept after a swap
+    FILTER_MIN_CONFIDENCE: float = float(os.getenv("FILTER_MIN_CONFIDENCE", 0.8))  # fuzzy city / category matches
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", 1000))  # generated answers, 0 = disabled
+    RESPONSE_CACHE_TTL: float = float(os.getenv("RESPONSE_CACHE_TTL", 24 * 3600))  # seconds
+    RESPONSE_CACHE_SIMILARITY: float = float(os.getenv("RESPONSE_CACHE_SIMILARITY", 0.92))  # min query cosine similarity
+    STRUCTURED_ANSWERS: bool = os.getenv("STRUCTURED_ANSWERS", "true").lower() in ("1", "true", "yes")  # LLM-free fast path
+    RAG_BACKGROUND_LOAD: bool = os.getenv("RAG_BACKGROUND_LOAD", "true").lower() in ("1", "true", "yes")
     # os.environ["LANGCHAIN_API_KEY"] = os.getenv("LANGCHAIN_API_KEY")
 
 
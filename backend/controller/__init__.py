@@ -1,3 +1,11 @@
 # from controller.utill import PlacesRAGDatabase
 from controller.custom_exception import *
-from controller.rag import RAGPipeline
\ No newline at end of file
+
+
+def __getattr__(name):
+    # controller.rag pulls in pandas and langchain, import it on first use only so
+    # alembic, models and the auth / session routes do not pay for it
+    if name == 'RAGPipeline':
+        from controller.rag import RAGPipeline
+        return RAGPipeline
+    raise AttributeError(f"module 'controller' has no attribute '{name}'")
@@ -0,0 +1,39 @@
+import os
+import json
+import numpy as np
+from typing import Dict
+
+
+# Written last by save_arrays, so a directory holding it is complete
+META_FILE = "meta.json"
+
+
+def save_arrays(path: str, arrays: Dict[str, np.ndarray], meta: Dict, format_version: int):
+    """Write arrays as <name>.npy files next to a meta.json stamped with format_version"""
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(path, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'format_version': format_version, **meta}, f, ensure_ascii=False)
+
+
+def exists(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+def load_meta(path: str, format_version: int, kind: str) -> Dict:
+    """meta.json of a directory written by save_arrays, ValueError for any other layout version"""
+    with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format_version') != format_version:
+        raise ValueError(f"Unsupported {kind} format {meta.get('format_version')} in {path}")
+    return meta
+
+
+def load_array(path: str, name: str) -> np.ndarray:
+    """Memory-map <name>.npy read-only
+
+    Returned as a plain ndarray view of the mapping: np.memmap slicing is slow on
+    the many small lookups searches make.
+    """
+    return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r', allow_pickle=False).view(np.ndarray)
@@ -41,6 +41,11 @@ class ResponseGenerationError(RAGError):
     def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
         super().__init__(message, "RESPONSE_GENERATION_ERROR", details)
 
+class PipelineNotReadyError(RAGError):
+    """Raised when the RAG pipeline is still loading or failed to load"""
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(message, "PIPELINE_NOT_READY", details)
+
 class ErrorResponse(BaseModel):
     """Standardized error response model"""
     error_code: str
@@ -0,0 +1,52 @@
+import os
+import json
+import hashlib
+from typing import Dict, Optional, Tuple
+
+
+def _fingerprint(stat: os.stat_result) -> Dict:
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'inode': stat.st_ino}
+
+
+class DatasetManifest:
+    """Size, mtime and content hash of every dataset an index was built from
+
+    A warm start only has to stat the CSV: when size, mtime and inode still match the
+    recorded fingerprint the recorded hash is trusted and the file is never opened.
+    Otherwise the file is read once, hashed, and the same bytes are handed back so a
+    rebuild can parse them without reading the file again.
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def lookup(self, csv_path: str) -> Optional[str]:
+        """Recorded hash of csv_path, None when the file changed or was never recorded"""
+        entry = self._load().get(os.path.realpath(csv_path))
+        if entry is None:
+            return None
+        fingerprint = {key: entry.get(key) for key in ('size', 'mtime_ns', 'inode')}
+        return entry.get('md5') if fingerprint == _fingerprint(os.stat(csv_path)) else None
+
+    def read(self, csv_path: str) -> Tuple[str, bytes]:
+        """Read csv_path once, returning its hash and content"""
+        with open(csv_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            data = f.read()
+        csv_hash = hashlib.md5(data).hexdigest()
+        self.record(csv_path, csv_hash, stat)
+        return csv_hash, data
+
+    def record(self, csv_path: str, csv_hash: str, stat: os.stat_result):
+        entries = self._load()
+        entries[os.path.realpath(csv_path)] = {**_fingerprint(stat), 'md5': csv_hash}
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,160 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional
+from controller import EmbeddingsError
+from controller.embedding_store import DocumentEmbeddingStore
+
+
+# openai errors worth retrying that carry no HTTP status
+TRANSIENT_ERRORS = {'RateLimitError', 'APITimeoutError', 'APIConnectionError', 'InternalServerError'}
+
+
+def _status(error: Exception) -> Optional[int]:
+    return getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+
+
+def _is_rate_limit(error: Exception) -> bool:
+    return _status(error) == 429 or type(error).__name__ == 'RateLimitError'
+
+
+def _is_transient(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections; a bad key or request is not"""
+    status = _status(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in TRANSIENT_ERRORS or isinstance(error, (TimeoutError, ConnectionError))
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds the API asked us to wait, if it said so"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingBuildPipeline:
+    """Embeds documents in chunks with bounded, adaptive concurrency
+
+    Every finished chunk is written to the DocumentEmbeddingStore straight away, which
+    makes the store the checkpoint: an interrupted build re-run with the same texts
+    only embeds the chunks that never completed.
+
+    Chunks failing with a transient error are retried with exponential backoff and
+    jitter, honouring Retry-After; any other error (a bad key, an oversized input)
+    fails the build at once. A rate limit also halves the number of requests in
+    flight, which then grows back by one after every `recover_after` successful chunks.
+    Once a chunk fails for good, chunks still waiting or backing off stop instead of
+    spending their requests on a build that has already failed.
+    """
+    def __init__(self, embeddings, store: DocumentEmbeddingStore, chunk_size: int = 500, max_workers: int = 4,
+                 max_retries: int = 8, base_delay: float = 1.0, max_delay: float = 60.0,
+                 recover_after: int = 5, report_every: float = 10.0):
+        self.embeddings = embeddings
+        self.store = store
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.recover_after = recover_after
+        self.report_every = report_every
+
+        self._condition = threading.Condition()
+        self._limit = max_workers
+        self._active = 0
+        self._streak = 0
+        self._stop = threading.Event()
+
+    def _acquire(self) -> bool:
+        """Take a request slot, False when the build was stopped while waiting for one"""
+        with self._condition:
+            while self._active >= self._limit and not self._stop.is_set():
+                self._condition.wait()
+            if self._stop.is_set():
+                return False
+            self._active += 1
+            return True
+
+    def _release(self, rate_limited: bool = False):
+        with self._condition:
+            self._active -= 1
+            if rate_limited:
+                self._limit = max(1, self._limit // 2)
+                self._streak = 0
+            else:
+                self._streak += 1
+                if self._streak >= self.recover_after and self._limit < self.max_workers:
+                    self._limit += 1
+                    self._streak = 0
+            self._condition.notify_all()
+
+    def _halt(self):
+        """Stop every chunk that has not sent its request yet"""
+        with self._condition:
+            self._stop.set()
+            self._condition.notify_all()
+
+    def _embed_chunk(self, texts: List[str]) -> int:
+        for attempt in range(self.max_retries + 1):
+            if not self._acquire():
+                return 0
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                rate_limited = _is_rate_limit(e)
+                self._release(rate_limited=rate_limited)
+                if attempt == self.max_retries or not _is_transient(e):
+                    self._halt()
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                print(f"Embedding chunk failed ({'rate limited' if rate_limited else str(e)}), retrying in {delay:.1f}s")
+                if self._stop.wait(delay):
+                    return 0
+                continue
+            self._release()
+            self.store.put_many(texts, vectors)
+            return len(texts)
+
+    def run(self, texts: List[str]) -> Dict[str, List[float]]:
+        """Embed the texts that are not in the store yet and return vectors for all of them"""
+        texts = list(dict.fromkeys(texts))
+        vectors = self.store.get_many(texts)
+        missing = [text for text in texts if text not in vectors]
+        if not missing:
+            return vectors
+
+        chunks = [missing[start:start + self.chunk_size] for start in range(0, len(missing), self.chunk_size)]
+        print(f"Embedding {len(missing)} documents in {len(chunks)} chunks "
+              f"({len(vectors)} already embedded, up to {self.max_workers} requests in flight)")
+
+        started = last_report = time.time()
+        done = 0
+        self._stop.clear()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._embed_chunk, chunk) for chunk in chunks]
+            try:
+                for future in as_completed(futures):
+                    done += future.result()
+                    now = time.time()
+                    if now - last_report >= self.report_every or done == len(missing):
+                        rate = done / max(now - started, 1e-9)
+                        eta = (len(missing) - done) / rate if rate else float('inf')
+                        print(f"Embedded {done}/{len(missing)} documents, {rate:.1f} docs/s, "
+                              f"{self._limit} in flight, eta {eta:.0f}s")
+                        last_report = now
+            except Exception as e:
+                self._halt()
+                for future in futures:
+                    future.cancel()
+                raise EmbeddingsError(
+                    f"Embedding build stopped after {done}/{len(missing)} documents, "
+                    f"re-run to resume: {str(e)}")
+
+        vectors.update(self.store.get_many(missing))
+        return vectors
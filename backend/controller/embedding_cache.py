@@ -0,0 +1,137 @@
+import os
+import time
+import sqlite3
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+
+def normalize_query(text: str) -> str:
+    """Cache key form of a query: lower case with collapsed whitespace"""
+    return " ".join(text.lower().split())
+
+
+class QueryEmbeddingCache:
+    """Query embedding cache in front of an Embeddings object
+
+    Normalized query text maps to its vector in a bounded in-process LRU with a TTL.
+    When disk_path is set, vectors are also written to a small sqlite file that
+    survives restarts and is consulted on a memory miss. The file gets the same TTL
+    and holds at most disk_max_size rows (max_size by default): expired rows are
+    deleted when it is opened, the oldest ones whenever it outgrows the cap. Only
+    queries go through here, document embeddings for the index are not cached.
+    """
+    def __init__(self, embeddings, max_size: int = 10000, ttl_seconds: float = 7 * 24 * 3600, disk_path: Optional[str] = None,
+                 disk_max_size: Optional[int] = None):
+        self.embeddings = embeddings
+        self.model = str(getattr(embeddings, 'model', ''))
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        self.disk_max_size = max_size if disk_max_size is None else disk_max_size
+        self._disk_rows = 0
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(model TEXT, query TEXT, created REAL, vector BLOB, PRIMARY KEY (model, query))")
+            self._db.execute("CREATE INDEX IF NOT EXISTS query_embeddings_created ON query_embeddings (created)")
+            self._prune_disk(time.time())
+            self._db.commit()
+
+    def _prune_disk(self, now: float):
+        """Delete expired rows, then the oldest ones above disk_max_size"""
+        self._db.execute("DELETE FROM query_embeddings WHERE created < ?", (now - self.ttl_seconds,))
+        rows = self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+        if rows > self.disk_max_size:
+            self._db.execute(
+                "DELETE FROM query_embeddings WHERE rowid IN "
+                "(SELECT rowid FROM query_embeddings ORDER BY created LIMIT ?)", (rows - self.disk_max_size,))
+            rows = self.disk_max_size
+        self._disk_rows = rows
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, vector = entry
+                if now - created <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, vector FROM query_embeddings WHERE model = ? AND query = ?",
+                    (self.model, key)).fetchone()
+                if row is not None and now - row[0] <= self.ttl_seconds:
+                    vector = np.frombuffer(row[1], dtype=np.float32).tolist()
+                    self._remember(key, row[0], vector)
+                    self.disk_hits += 1
+                    return vector
+        return None
+
+    def _remember(self, key: str, created: float, vector: List[float]):
+        self._entries[key] = (created, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _put(self, key: str, vector: List[float]):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, vector)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?)",
+                    (self.model, key, now, np.asarray(vector, dtype=np.float32).tobytes()))
+                # Counts replaced rows too, the prune recounts
+                self._disk_rows += 1
+                if self._disk_rows > self.disk_max_size:
+                    self._prune_disk(now)
+                self._db.commit()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed queries, sending only the cache misses (deduplicated) in one bulk call"""
+        keys = [normalize_query(text) for text in texts]
+        vectors = {}
+        for key in keys:
+            if key not in vectors:
+                vector = self._get(key)
+                if vector is not None:
+                    vectors[key] = vector
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing:
+            with self._lock:
+                self.misses += len(missing)
+            for key, vector in zip(missing, self.embeddings.embed_documents(missing)):
+                self._put(key, vector)
+                vectors[key] = vector
+        return [vectors[key] for key in keys]
+
+    def stats(self) -> Dict:
+        """Counters for monitoring, every hit is an embedding round-trip saved"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
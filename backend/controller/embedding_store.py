@@ -0,0 +1,55 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from typing import List, Dict
+
+
+class DocumentEmbeddingStore:
+    """Persistent document embeddings keyed by a hash of the embedding model and document text
+
+    Rebuilding the index after a CSV edit only has to embed documents whose rendered
+    text is new; every unchanged document gets its vector from here.
+    """
+    def __init__(self, path: str, model: str = ''):
+        self.path = path
+        self.model = model
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS document_embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+        self._db.commit()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\n{text}".encode('utf-8')).hexdigest()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM document_embeddings").fetchone()[0]
+
+    def get_many(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors for the given texts, texts without a vector are left out"""
+        keys = {self.key(text): text for text in texts}
+        found = {}
+        key_list = list(keys)
+        with self._lock:
+            for start in range(0, len(key_list), 500):
+                chunk = key_list[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM document_embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall()
+                for key, vector in rows:
+                    found[keys[key]] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def put_many(self, texts: List[str], vectors):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO document_embeddings VALUES (?, ?)",
+                [(self.key(text), np.asarray(vector, dtype=np.float32).tobytes()) for text, vector in zip(texts, vectors)])
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
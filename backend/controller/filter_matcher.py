@@ -0,0 +1,214 @@
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from controller.place_store import PlaceStore
+from controller.lexical_index import tokenize, STOPWORDS
+from controller.fuzzy_index import TrigramIndex
+
+
+# Words and phrases that select a main category, keyed by the category they select
+CATEGORY_SYNONYMS = {
+    'public places': [
+        'public places', 'park', 'parks', 'garden', 'gardens', 'plaza', 'square', 'museum',
+        'gallery', 'beach', 'beaches', 'landmark', 'monuments', 'library',
+        'public space', 'community center', 'playground'
+    ],
+    'restaurants': [
+        'restaurants', 'eatery', 'cafe', 'diner', 'dining', 'bistro', 'food', 'fast food',
+        'pizzeria', 'steakhouse', 'bakery', 'coffee shop', 'bar', 'pub',
+        'buffet', 'grill', 'bbq', 'seafood place'
+    ],
+    'hotels': [
+        'hotels', 'motel', 'inn', 'resort', 'lodge', 'accommodation', 'stay', 'hostel',
+        'guesthouse', 'bed and breakfast', 'b&b', 'airbnb', 'apartment',
+        'lodging', 'place to stay'
+    ],
+    'mosques': [
+        'mosques', 'masjid', 'mosque', 'islamic center', 'prayer hall', 'prayer room',
+        'jummah', 'religious place', 'worship place'
+    ]
+}
+
+# Phrases that set a filter to a fixed value
+RULES = [
+    (['best', 'top', 'highest rated'], 'min_rating', 4.0),
+]
+
+# Filters that are also resolved from misspelled query words
+FUZZY_KEYS = ('city', 'main_category')
+# Shorter words are too likely to be one edit away from an unrelated city
+MIN_FUZZY_LENGTH = 5
+# A word found in at least this many places is a real word, not a typo
+KNOWN_WORD_COUNT = 5
+# Words that add nothing to a query once its filters are known ("places in Multan")
+FILLER_WORDS = {'place', 'places', 'spot', 'spots', 'option', 'options', 'all', 'city', 'rated', 'highest'}
+
+
+def _stem(token: str) -> str:
+    """Fold plurals so 'hotel' and 'hotels' match the same pattern"""
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def _terms(text: str) -> Tuple[str, ...]:
+    return tuple(_stem(token) for token in tokenize(text))
+
+
+class FilterMatcher:
+    """Token trie over every city, main category synonym, type and rule phrase
+
+    Built once per index from its place store. resolve() walks the query tokens
+    through the trie in a single pass, so patterns only match whole words ("bar"
+    does not match "barbecue", "inn" does not match "dinner") and plurals fold onto
+    their singular. Per filter the longest match wins, then the leftmost; main
+    categories keep the priority order of CATEGORY_SYNONYMS.
+
+    City and main category also fall back to a TrigramIndex when nothing matches
+    exactly ("Rawalpindy", "Faislabad"). Only spans of query words that matched no
+    pattern are tried, and single words common in the place data (document_count
+    gives the number of places using a word) are taken as spelled correctly.
+    Every filter resolve() returns comes with its confidence.
+    """
+    def __init__(self, cities: Iterable[str], categories: Iterable[str], types: Iterable[str],
+                 document_count: Optional[Callable[[str], int]] = None):
+        self._trie: Dict = {}
+        cities = list(cities)
+        self.document_count = document_count or (lambda word: 0)
+        self.categories = list(categories)
+        self.category_priority = {}
+        for priority, (name, synonyms) in enumerate(CATEGORY_SYNONYMS.items()):
+            canonical = self.canonical_category(name)
+            self.category_priority[canonical] = priority
+            for synonym in synonyms:
+                self._add(synonym, 'main_category', canonical)
+        for city in cities:
+            self._add(city, 'city', city)
+        for place_type in types:
+            self._add(place_type, 'types', place_type)
+        for phrases, key, value in RULES:
+            for phrase in phrases:
+                self._add(phrase, key, value)
+
+        self.fuzzy = {
+            'city': TrigramIndex([(city, city) for city in cities]),
+            'main_category': TrigramIndex([
+                (synonym, self.canonical_category(name))
+                for name, synonyms in CATEGORY_SYNONYMS.items()
+                for synonym in synonyms if len(synonym) >= MIN_FUZZY_LENGTH
+            ]),
+        }
+        self.max_fuzzy_terms = max([len(tokenize(city)) for city in cities] + [3])
+
+    @classmethod
+    def from_places(cls, places: PlaceStore, document_count: Optional[Callable[[str], int]] = None) -> "FilterMatcher":
+        return cls(places.values('city'), places.values('main_category'), places.values('types'), document_count)
+
+    def canonical_category(self, name: str) -> str:
+        """The dataset's spelling of a category name, e.g. 'mosques' -> 'mosques or masjid'"""
+        folded = name.casefold()
+        for category in self.categories:
+            if category.casefold() == folded or category.casefold().startswith(folded + ' '):
+                return category
+        return name
+
+    def _add(self, phrase: str, key: str, value):
+        terms = _terms(phrase)
+        if not terms:
+            return
+        node = self._trie
+        for term in terms:
+            node = node.setdefault(term, {})
+        node.setdefault(None, []).append((key, value))
+
+    def matches(self, query: str) -> List[Tuple[int, int, str, object]]:
+        """Every (start, length, key, value) pattern occurrence in the query"""
+        terms = _terms(query)
+        found = []
+        for start in range(len(terms)):
+            node = self._trie
+            for position in range(start, len(terms)):
+                node = node.get(terms[position])
+                if node is None:
+                    break
+                for key, value in node.get(None, ()):
+                    found.append((start, position - start + 1, key, value))
+        return found
+
+    def _fuzzy_spans(self, tokens: List[str], covered: set):
+        """Token ranges of the query, not touching exact matches, worth a fuzzy lookup"""
+        for start in range(len(tokens)):
+            for end in range(start + 1, min(start + self.max_fuzzy_terms, len(tokens)) + 1):
+                if covered.intersection(range(start, end)):
+                    break
+                if tokens[start] in STOPWORDS or tokens[end - 1] in STOPWORDS:
+                    continue
+                text = ' '.join(tokens[start:end])
+                if len(text) < MIN_FUZZY_LENGTH or (end - start == 1 and self.document_count(text) >= KNOWN_WORD_COUNT):
+                    continue
+                yield range(start, end)
+
+    def _resolve(self, query: str) -> Tuple[Dict[str, Tuple[object, float]], Dict[str, range], List[str]]:
+        """resolve() plus the token range each filter was read from, and the query tokens"""
+        best: Dict[str, Tuple] = {}
+        covered = set()
+        for start, length, key, value in self.matches(query):
+            covered.update(range(start, start + length))
+            if key == 'main_category':
+                rank = (self.category_priority.get(value, len(self.category_priority)), -length, start)
+            else:
+                rank = (-length, start)
+            if key not in best or rank < best[key][0]:
+                best[key] = (rank, value, range(start, start + length))
+        resolved = {key: (value, 1.0) for key, (_, value, _) in best.items()}
+        spans = {key: span for key, (_, _, span) in best.items()}
+
+        tokens = tokenize(query)
+        for key in FUZZY_KEYS:
+            if key in resolved:
+                continue
+            for span in self._fuzzy_spans(tokens, covered):
+                hit = self.fuzzy[key].lookup(' '.join(tokens[span.start:span.stop]))
+                if hit is not None and (key not in resolved or hit[1] > resolved[key][1]):
+                    resolved[key] = hit
+                    spans[key] = span
+        return resolved, spans, tokens
+
+    def resolve(self, query: str) -> Dict[str, Tuple[object, float]]:
+        """Filters named by the query as {key: (value, confidence)}, 1.0 for exact matches"""
+        return self._resolve(query)[0]
+
+    def unmatched_terms(self, query: str, min_confidence: float = 1.0) -> List[str]:
+        """Query words not read into a filter (fuzzy ones at min_confidence) and not filler
+
+        Only the match each filter kept counts: in "hotels near the airport in Karachi"
+        the type 'airport' loses to 'hotel', so "airport" is left over. An empty list
+        means the filters say everything the query says.
+        """
+        return self._unmatched(query, min_confidence)[1]
+
+    def is_fully_matched(self, query: str, min_confidence: float = 1.0) -> bool:
+        """True when the query names a filter itself and has no other words than filler
+
+        A follow-up such as "what about those?" names no filter, so filters carried
+        over from the chat history cannot be said to cover it.
+        """
+        used, unmatched = self._unmatched(query, min_confidence)
+        return bool(used) and not unmatched
+
+    def _unmatched(self, query: str, min_confidence: float) -> Tuple[set, List[str]]:
+        """Token positions read into a filter, and the words left over"""
+        resolved, spans, tokens = self._resolve(query)
+        used = set()
+        for key, (_, confidence) in resolved.items():
+            if confidence >= min_confidence:
+                used.update(spans[key])
+        return used, [
+            token for position, token in enumerate(tokens)
+            if position not in used and token not in STOPWORDS and token not in FILLER_WORDS
+        ]
+
+    def canonical(self, filters: Optional[Dict]) -> Dict:
+        """filters with a main_category spelled the way the dataset spells it"""
+        filters = dict(filters or {})
+        if filters.get('main_category'):
+            filters['main_category'] = self.canonical_category(str(filters['main_category']))
+        return filters
@@ -0,0 +1,67 @@
+from typing import Dict, List, Optional, Tuple
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance with adjacent transpositions, limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class TrigramIndex:
+    """Typo tolerant lookup of short phrases (city names, category words)
+
+    Candidates share at least min_shared padded character trigrams with the text,
+    and no fewer than an edit distance of max_distance can leave (each edit touches
+    at most three trigrams), and are then verified with a bounded edit distance. The confidence of a match is
+    1 - distance / length of the longer string, so one typo in a ten letter city
+    name scores 0.9.
+    """
+    def __init__(self, entries: List[Tuple[str, object]], max_distance: int = 2, min_shared: int = 2):
+        self.max_distance = max_distance
+        self.min_shared = min_shared
+        self.phrases = [phrase.casefold() for phrase, _ in entries]
+        self.values = [value for _, value in entries]
+        self.postings: Dict[str, List[int]] = {}
+        for entry_id, phrase in enumerate(self.phrases):
+            for trigram in _trigrams(phrase):
+                self.postings.setdefault(trigram, []).append(entry_id)
+
+    def lookup(self, text: str) -> Optional[Tuple[object, float]]:
+        """Best (value, confidence) for text, None when nothing is within max_distance"""
+        text = text.casefold()
+        trigrams = _trigrams(text)
+        min_shared = max(self.min_shared, len(trigrams) - 3 * self.max_distance)
+        shared: Dict[int, int] = {}
+        for trigram in trigrams:
+            for entry_id in self.postings.get(trigram, ()):
+                shared[entry_id] = shared.get(entry_id, 0) + 1
+
+        best = None
+        for entry_id, count in shared.items():
+            if count < min_shared:
+                continue
+            phrase = self.phrases[entry_id]
+            distance = edit_distance(text, phrase, self.max_distance)
+            if distance > self.max_distance:
+                continue
+            confidence = 1 - distance / max(len(text), len(phrase))
+            if best is None or confidence > best[1]:
+                best = (self.values[entry_id], confidence)
+        return best
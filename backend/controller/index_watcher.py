@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+import traceback
+from typing import List, Optional, Tuple
+from controller.vector_index import PlacesVectorIndex
+
+
+class IndexWatcher:
+    """Hot-swaps the pipeline's index when build_index.py publishes a new version
+
+    A daemon thread polls CURRENT. A new version is opened and warmed up on that
+    thread, then swapped in with a single reference assignment, so requests never
+    wait for it. Requests that started on the old version keep their own reference
+    and finish on it; the watcher holds the old version for drain_seconds and then
+    drops it so its memory maps can be released.
+    """
+    def __init__(self, pipeline, generator, poll_seconds: float = 30.0, drain_seconds: float = 60.0):
+        self.pipeline = pipeline
+        self.generator = generator
+        self.poll_seconds = poll_seconds
+        self.drain_seconds = drain_seconds
+        self.swaps = 0
+        self.last_swap: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._failed_path: Optional[str] = None
+        self._retired: List[Tuple[PlacesVectorIndex, float]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="index-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds)
+
+    def _run(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.check()
+            except Exception:
+                print(traceback.format_exc(1))
+            self._release_retired()
+
+    def check(self) -> bool:
+        """Swap in the published version if it is not the live one, True when a swap happened"""
+        index_path = self.generator.get_published_index_path()
+        if index_path is None or index_path == self._failed_path:
+            return False
+        if os.path.realpath(index_path) == os.path.realpath(self.pipeline.vectorstore.index_path):
+            return False
+
+        started = time.time()
+        try:
+            index = PlacesVectorIndex(index_path, index_type=self.generator.index_type)
+            if not len(index):
+                raise ValueError("index has no places")
+            index.warm()
+        except Exception as e:
+            # Keep serving the current version, retry once another version is published
+            self._failed_path = index_path
+            self.last_error = f"{os.path.basename(index_path)}: {str(e)}"
+            print(f"Could not load published index {index_path} (reason: {str(e)})")
+            return False
+
+        old = self.pipeline.swap_index(index)
+        self._retired.append((old, time.time()))
+        self.swaps += 1
+        self.last_swap = time.time()
+        self.last_error = None
+        print(f"Swapped places index {old.version} -> {index.version} (loaded in {time.time() - started:.1f}s)")
+        return True
+
+    def _release_retired(self):
+        now = time.time()
+        self._retired = [(index, retired_at) for index, retired_at in self._retired
+                         if now - retired_at < self.drain_seconds]
+
+    def stats(self) -> dict:
+        return {
+            'swaps': self.swaps,
+            'last_swap': self.last_swap,
+            'draining': [index.version for index, _ in self._retired],
+            'last_error': self.last_error,
+        }
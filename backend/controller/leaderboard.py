@@ -0,0 +1,142 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from controller import artifact_io
+from controller.place_store import PlaceStore
+
+
+# Fields a leaderboard is keyed by, each can also be left open (None = any value)
+BOARD_FIELDS = ('city', 'main_category', 'types')
+
+# Layout version of the leaderboards directory
+FORMAT_VERSION = 1
+ARRAYS = ('offsets', 'rows', 'ranks', 'scores')
+
+
+def _normalize(value) -> Optional[str]:
+    value = '' if value is None else str(value).strip().casefold()
+    return value or None
+
+
+def _tags(value) -> List[str]:
+    return [tag.strip() for tag in str(value or '').split(',') if tag.strip()]
+
+
+def bayesian_scores(ratings: np.ndarray, counts: np.ndarray, prior_mean: float, prior_count: float) -> np.ndarray:
+    """(v * R + m * C) / (v + m): a rating pulled toward prior_mean C until it has many more than m reviews"""
+    counts = np.maximum(counts, 0).astype(np.float64)
+    ratings = np.where(np.isnan(ratings), prior_mean, ratings)
+    return (counts * ratings + prior_count * prior_mean) / (counts + prior_count)
+
+
+class Leaderboards:
+    """Places ranked by confidence-adjusted rating for every (city, main_category, type)
+
+    Computed once per index build. The score of a place is the Bayesian average of
+    its rating and review count: a 5.0 from 3 reviews ranks below a 4.8 from 5000.
+    The prior is the mean rating of all rated places, weighted as prior_count
+    reviews (the median review count unless given). A board is kept for every
+    combination of city, main category and type tag that occurs, with any of the
+    three left open, so "best restaurants in Lahore" and "top mosques" both read an
+    already sorted list and top() costs O(k).
+
+    save() writes the boards as one concatenated int32 array of rows plus offsets
+    and the keys in meta.json; load() memory-maps them.
+    """
+    def __init__(self, keys: List[Tuple], offsets: np.ndarray, rows: np.ndarray, ranks: np.ndarray,
+                 scores: np.ndarray, prior_mean: float, prior_count: float):
+        self.keys = keys
+        self.offsets = offsets
+        self.rows = rows
+        self.ranks = ranks
+        self.scores = scores
+        self.prior_mean = prior_mean
+        self.prior_count = prior_count
+        self._boards = {tuple(_normalize(value) for value in key): board_id for board_id, key in enumerate(keys)}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, places: PlaceStore, prior_count: Optional[float] = None) -> "Leaderboards":
+        ratings = np.asarray(places.numbers['rating'], dtype=np.float64)
+        counts = np.maximum(np.asarray(places.numbers['user_rating_count']), 0)
+        rated = ~np.isnan(ratings) & (counts > 0)
+        prior_mean = float(ratings[rated].mean()) if rated.any() else 0.0
+        if prior_count is None:
+            prior_count = float(np.median(counts[rated])) if rated.any() else 1.0
+        prior_count = max(float(prior_count), 1.0)
+        scores = bayesian_scores(ratings, counts, prior_mean, prior_count)
+
+        # Best first, more reviews breaking ties
+        order = np.lexsort((-counts, -scores))
+        ranks = np.empty(len(places), dtype=np.int32)
+        ranks[order] = np.arange(len(places), dtype=np.int32)
+
+        cities, categories, types = (places.column(field) for field in BOARD_FIELDS)
+        boards: Dict[Tuple, List[int]] = {}
+        for row_id in order.tolist():
+            for city in {None, cities[row_id]}:
+                for category in {None, categories[row_id]}:
+                    for tag in [None] + list(dict.fromkeys(_tags(types[row_id]))):
+                        boards.setdefault((city, category, tag), []).append(row_id)
+
+        keys = list(boards)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(boards[key]) for key in keys], out=offsets[1:])
+        rows = np.fromiter((row_id for key in keys for row_id in boards[key]), dtype=np.int32, count=int(offsets[-1]))
+        return cls(keys, offsets, rows, ranks, scores.astype(np.float32), prior_mean, prior_count)
+
+    def save(self, path: str):
+        """Write the boards as a directory of arrays"""
+        arrays = {name: getattr(self, name) for name in ARRAYS}
+        meta = {'prior_mean': self.prior_mean, 'prior_count': self.prior_count, 'keys': self.keys}
+        artifact_io.save_arrays(path, arrays, meta, FORMAT_VERSION)
+
+    @classmethod
+    def load(cls, path: str) -> "Leaderboards":
+        meta = artifact_io.load_meta(path, FORMAT_VERSION, "leaderboards")
+        arrays = {name: artifact_io.load_array(path, name) for name in ARRAYS}
+        return cls([tuple(key) for key in meta['keys']], prior_mean=meta['prior_mean'],
+                   prior_count=meta['prior_count'], **arrays)
+
+    def board(self, city=None, category=None, place_type=None) -> np.ndarray:
+        """Rows of one board, best first; empty when the combination never occurs"""
+        board_id = self._boards.get((_normalize(city), _normalize(category), _normalize(place_type)))
+        if board_id is None:
+            return self.rows[:0]
+        return self.rows[self.offsets[board_id]:self.offsets[board_id + 1]]
+
+    def _typed_board(self, city, category, tags: List[str]) -> np.ndarray:
+        boards = [self.board(city, category, tag) for tag in tags]
+        if len(boards) == 1:
+            return boards[0]
+        # Places tagged with any of the types, merged back into score order
+        rows = np.unique(np.concatenate(boards))
+        return rows[np.argsort(self.ranks[rows], kind='stable')]
+
+    def top(self, filters: Optional[Dict], k: int, places: PlaceStore) -> List[int]:
+        """Rows of the k best places matching filters
+
+        city and main_category select the board; with types only places tagged
+        with one of them are returned; min_rating and min_reviews are checked while
+        walking the board.
+        """
+        filters = filters or {}
+        city, category = filters.get('city'), filters.get('main_category')
+        tags = _tags(filters.get('types'))
+        board = self._typed_board(city, category, tags) if tags else self.board(city, category)
+        min_rating, min_reviews = filters.get('min_rating'), filters.get('min_reviews')
+        ratings, counts = places.numbers['rating'], places.numbers['user_rating_count']
+
+        top = []
+        chunk = max(4 * k, 64)
+        for start in range(0, len(board), chunk):
+            for row_id in board[start:start + chunk].tolist():
+                if min_rating is not None and not ratings[row_id] >= float(min_rating):
+                    continue
+                if min_reviews is not None and counts[row_id] < int(min_reviews):
+                    continue
+                top.append(row_id)
+                if len(top) == k:
+                    return top
+        return top
@@ -0,0 +1,173 @@
+import re
+import math
+import numpy as np
+from bisect import bisect_left
+from collections import Counter
+from typing import List, Dict, Optional, Sequence, Set, Tuple
+from controller import artifact_io
+from controller.place_store import PlaceStore, StringColumn
+
+
+# Layout version of the lexical index directory
+FORMAT_VERSION = 1
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+STOPWORDS = {
+    'a', 'an', 'and', 'any', 'are', 'around', 'at', 'best', 'by', 'can', 'find', 'for', 'from',
+    'get', 'give', 'good', 'great', 'i', 'in', 'is', 'it', 'list', 'looking', 'me', 'my', 'near',
+    'nearby', 'nice', 'of', 'on', 'or', 'please', 'recommend', 'show', 'some', 'suggest', 'tell',
+    'the', 'to', 'top', 'want', 'what', 'where', 'which', 'with', 'you'
+}
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lower case word tokens, type tags like fast_food_restaurant are split on underscores"""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(str(text).casefold().replace('_', ' '))
+
+
+def reciprocal_rank_fusion(rankings: List[List[Tuple[int, float]]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse several rankings of (row_id, score) into one, scored by sum of 1 / (k + rank)"""
+    fused = {}
+    for ranking in rankings:
+        for rank, (row_id, _) in enumerate(ranking, start=1):
+            fused[row_id] = fused.get(row_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class LexicalIndex:
+    """BM25 inverted index over place name, address, types and city
+
+    The name is counted twice so that name matches outrank address mentions.
+    is_strong_match() recognises queries that name a specific place, which can then be
+    answered from this index alone without an embedding call.
+
+    Built once per index build. The postings are CSR arrays: the rows of token i
+    are rows[offsets[i]:offsets[i + 1]] with their term counts in counts, and the
+    sorted vocabulary is a UTF-8 blob looked up by binary search. save() writes them
+    as a directory of arrays and load() memory-maps them like the place store, so
+    every worker on a host shares one copy.
+    """
+    def __init__(self, places: PlaceStore, tokens: Sequence[str], offsets: np.ndarray, rows: np.ndarray,
+                 counts: np.ndarray, lengths: np.ndarray, k1: float = 1.2, b: float = 0.75):
+        self.places = places
+        self.tokens = tokens
+        self.offsets = offsets
+        self.rows = rows
+        self.counts = counts
+        self.lengths = lengths
+        self.k1 = k1
+        self.b = b
+        self.size = len(places)
+        average_length = float(lengths.mean()) if self.size else 0.0
+        self.length_norm = self.k1 * (1 - self.b + self.b * lengths / max(average_length, 1e-9))
+
+        # Words that describe what or where a place is rather than which place it is
+        generic = set(STOPWORDS)
+        for field in ('city', 'main_category', 'types'):
+            for value in places.values(field):
+                generic.update(tokenize(value))
+        self.generic_tokens = generic | {token + 's' for token in generic}
+
+    @classmethod
+    def build(cls, places: PlaceStore, k1: float = 1.2, b: float = 0.75) -> "LexicalIndex":
+        names = places.column('display_name')
+        addresses = places.column('formatted_address')
+        types = places.column('types')
+        cities = places.column('city')
+
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        lengths = np.zeros(len(places), dtype=np.float32)
+        for row_id, (name, address, place_types, city) in enumerate(zip(names, addresses, types, cities)):
+            tokens = tokenize(name) * 2 + tokenize(address) + tokenize(place_types) + tokenize(city)
+            lengths[row_id] = len(tokens)
+            for token, count in Counter(tokens).items():
+                token_rows, token_counts = postings.setdefault(token, ([], []))
+                token_rows.append(row_id)
+                token_counts.append(count)
+
+        vocabulary = sorted(postings)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum([len(postings[token][0]) for token in vocabulary], out=offsets[1:])
+        rows = np.fromiter((row_id for token in vocabulary for row_id in postings[token][0]),
+                           dtype=np.int32, count=int(offsets[-1]))
+        counts = np.fromiter((count for token in vocabulary for count in postings[token][1]),
+                             dtype=np.float32, count=int(offsets[-1]))
+        return cls(places, vocabulary, offsets, rows, counts, lengths, k1=k1, b=b)
+
+    def save(self, path: str):
+        """Write the postings as a directory of arrays"""
+        data, token_offsets = StringColumn.encode(list(self.tokens))
+        arrays = {'tokens.data': data, 'tokens.offsets': token_offsets, 'offsets': self.offsets,
+                  'rows': self.rows, 'counts': self.counts, 'lengths': self.lengths}
+        artifact_io.save_arrays(path, arrays, {'rows': self.size, 'k1': self.k1, 'b': self.b}, FORMAT_VERSION)
+
+    @classmethod
+    def load(cls, path: str, places: PlaceStore) -> "LexicalIndex":
+        meta = artifact_io.load_meta(path, FORMAT_VERSION, "lexical index")
+
+        def array(name: str) -> np.ndarray:
+            return artifact_io.load_array(path, name)
+
+        index = cls(places, StringColumn(array('tokens.data'), array('tokens.offsets')), array('offsets'),
+                    array('rows'), array('counts'), array('lengths'), k1=meta['k1'], b=meta['b'])
+        if meta['rows'] != len(places) or index.lengths.shape[0] != len(places):
+            raise ValueError(f"Lexical index at {path} does not match its place store")
+        return index
+
+    def _token_id(self, token: str) -> Optional[int]:
+        if not isinstance(self.tokens, StringColumn):
+            position = bisect_left(self.tokens, token)
+            return position if position < len(self.tokens) and self.tokens[position] == token else None
+        # Binary search on the UTF-8 bytes, whose order is the code point order of the sorted tokens
+        key, data, offsets = token.encode('utf-8'), self.tokens.data, self.tokens.offsets
+        low, high = 0, len(self.tokens)
+        while low < high:
+            middle = (low + high) // 2
+            word = data[offsets[middle]:offsets[middle + 1]].tobytes()
+            if word == key:
+                return middle
+            if word < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def document_count(self, token: str) -> int:
+        """Number of places the token occurs in"""
+        token_id = self._token_id(token)
+        return 0 if token_id is None else int(self.offsets[token_id + 1] - self.offsets[token_id])
+
+    def distinctive_tokens(self, tokens) -> Set[str]:
+        return {token for token in tokens if token not in self.generic_tokens}
+
+    def search(self, query: str, k: int = 4, rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Return (row_id, BM25 score) pairs of the k best lexical matches, restricted to rows if given"""
+        scores = np.zeros(self.size, dtype=np.float32)
+        matched = False
+        for token in set(tokenize(query)):
+            token_id = None if token in STOPWORDS else self._token_id(token)
+            if token_id is None:
+                continue
+            start, end = int(self.offsets[token_id]), int(self.offsets[token_id + 1])
+            posting_rows, counts = self.rows[start:end], self.counts[start:end]
+            idf = math.log(1 + (self.size - (end - start) + 0.5) / (end - start + 0.5))
+            scores[posting_rows] += idf * counts * (self.k1 + 1) / (counts + self.length_norm[posting_rows])
+            matched = True
+        if not matched:
+            return []
+
+        candidates = np.flatnonzero(scores) if rows is None else rows[scores[rows] > 0]
+        if candidates.size == 0:
+            return []
+        n = min(k, candidates.size)
+        top = candidates[np.argpartition(-scores[candidates], n - 1)[:n]]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(row_id), float(scores[row_id])) for row_id in top]
+
+    def is_strong_match(self, query: str, row_id: int) -> bool:
+        """True when the query names this place: its distinctive words are exactly the place name's"""
+        name_tokens = self.distinctive_tokens(tokenize(self.places.column('display_name')[row_id]))
+        return bool(name_tokens) and name_tokens == self.distinctive_tokens(tokenize(query))
@@ -0,0 +1,85 @@
+import time
+import threading
+import traceback
+from typing import Dict, Optional
+from controller import RAGError, PipelineNotReadyError
+
+
+class RAGPipelineProvider:
+    """Builds the RAGPipeline on demand instead of at import time
+
+    start() is called from the application lifespan, either inline or on a background
+    thread so the process serves health checks and user / session routes while the
+    index loads. Routes that need retrieval call get(), which raises
+    PipelineNotReadyError until loading finished.
+    """
+    def __init__(self, **pipeline_kwargs):
+        self.pipeline_kwargs = pipeline_kwargs
+        self.state = "not_started"  # not_started / loading / ready / failed
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self._pipeline = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        from controller.rag import RAGPipeline
+        try:
+            self._pipeline = RAGPipeline(**self.pipeline_kwargs)
+            self.ready_at = time.time()
+            self.state = "ready"
+            print(f"RAG pipeline ready in {self.ready_at - self.started_at:.1f}s")
+        except Exception as e:
+            print(traceback.format_exc(1))
+            self.error = e.message if isinstance(e, RAGError) else str(e)
+            self.state = "failed"
+            raise
+
+    def start(self, background: bool = True):
+        """Begin loading the pipeline, once; with background=False this blocks and raises on failure"""
+        with self._lock:
+            if self.state != "not_started":
+                return
+            self.state = "loading"
+            self.started_at = time.time()
+        if not background:
+            self._load()
+            return
+
+        def run():
+            try:
+                self._load()
+            except Exception:
+                pass  # recorded in state / error, reported by status()
+
+        self._thread = threading.Thread(target=run, name="rag-pipeline-loader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop background work of a loaded pipeline, called on application shutdown"""
+        if self._pipeline is not None:
+            self._pipeline.close()
+
+    def get(self):
+        """The loaded pipeline, PipelineNotReadyError while it is loading or after it failed"""
+        if self.state != "ready":
+            raise PipelineNotReadyError(
+                f"RAG pipeline is {self.state.replace('_', ' ')}", details=self.status())
+        return self._pipeline
+
+    def is_ready(self) -> bool:
+        return self.state == "ready"
+
+    def status(self) -> Dict:
+        """Index load state for the readiness endpoint"""
+        now = time.time()
+        status = {'state': self.state, 'ready': self.is_ready()}
+        if self.started_at is not None:
+            status['load_seconds'] = round((self.ready_at or now) - self.started_at, 3)
+        if self.state == "ready":
+            status['places'] = len(self._pipeline.vectorstore)
+            status['index_version'] = self._pipeline.vectorstore.version
+        if self.error:
+            status['error'] = self.error
+        return status
@@ -0,0 +1,159 @@
+import numpy as np
+from typing import Dict, List, Sequence
+from controller import artifact_io
+
+
+PLACE_FIELDS = [
+    'id', 'display_name', 'formatted_address', 'lat', 'lng',
+    'types', 'rating', 'user_rating_count', 'city', 'main_category'
+]
+
+# Free text, kept as one string per row
+STRING_FIELDS = ('id', 'display_name', 'formatted_address')
+# Few distinct values, stored as int32 codes into a dictionary of values (-1 = missing)
+CATEGORICAL_FIELDS = ('types', 'city', 'main_category')
+# Typed arrays, NaN / -1 = missing
+NUMERIC_FIELDS = {'lat': np.float64, 'lng': np.float64, 'rating': np.float64, 'user_rating_count': np.int64}
+
+# Layout version of the binary store directory
+FORMAT_VERSION = 1
+
+
+class StringColumn:
+    """Read-only strings backed by a memory-mapped UTF-8 blob and an offsets array
+
+    Row i is data[offsets[i]:offsets[i + 1]], decoded when it is accessed.
+    """
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return self.offsets.shape[0] - 1
+
+    def __getitem__(self, row_id: int) -> str:
+        start, end = self.offsets[row_id], self.offsets[row_id + 1]
+        return self.data[start:end].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        # One copy of the blob instead of one small array view per row
+        blob = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield blob[start:end].decode('utf-8')
+
+    @staticmethod
+    def encode(values: Sequence[str]):
+        """UTF-8 blob and offsets for a sequence of strings"""
+        encoded = [value.encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+class PlaceStore:
+    """Columnar store of place records, row i describes vector i of the index
+
+    Coordinates, rating and review count are typed arrays, city, main category and
+    types are dictionary encoded. Search, filtering and response hydration read rows
+    by id from here instead of keeping a DataFrame or a metadata dict per place.
+
+    save() writes a directory of .npy arrays (strings as UTF-8 blob + offsets) and a
+    small meta.json with the dictionaries. load() memory-maps the arrays, so opening
+    a store reconstructs no per-place objects and never unpickles anything.
+    """
+    def __init__(self, strings: Dict[str, Sequence[str]], codes: Dict[str, np.ndarray],
+                 dictionaries: Dict[str, List[str]], numbers: Dict[str, np.ndarray]):
+        self.strings = strings
+        self.codes = codes
+        self.dictionaries = dictionaries
+        self.numbers = numbers
+        self.size = len(strings['id'])
+
+    def __len__(self) -> int:
+        return self.size
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, List]) -> "PlaceStore":
+        """Encode plain per-field lists of Python values (None = missing)"""
+        strings = {field: [str(value) for value in columns[field]] for field in STRING_FIELDS}
+        codes, dictionaries = {}, {}
+        for field in CATEGORICAL_FIELDS:
+            values = sorted({value for value in columns[field] if value is not None})
+            lookup = {value: code for code, value in enumerate(values)}
+            codes[field] = np.array(
+                [lookup[value] if value is not None else -1 for value in columns[field]], dtype=np.int32)
+            dictionaries[field] = values
+        numbers = {}
+        for field, dtype in NUMERIC_FIELDS.items():
+            missing = np.nan if dtype == np.float64 else -1
+            numbers[field] = np.array(
+                [value if value is not None else missing for value in columns[field]], dtype=dtype)
+        return cls(strings, codes, dictionaries, numbers)
+
+    def values(self, field: str) -> List[str]:
+        """Distinct values of a categorical field"""
+        return self.dictionaries[field]
+
+    def column(self, field: str) -> Sequence:
+        """A whole field as a sequence of Python values (None = missing)"""
+        if field in self.strings:
+            return self.strings[field]
+        if field in self.codes:
+            values = self.dictionaries[field]
+            return [values[code] if code >= 0 else None for code in self.codes[field].tolist()]
+        array = self.numbers[field]
+        missing = np.isnan(array) if array.dtype.kind == 'f' else array < 0
+        return [None if is_missing else value for value, is_missing in zip(array.tolist(), missing.tolist())]
+
+    def _value(self, field: str, row_id: int):
+        if field in self.strings:
+            return self.strings[field][row_id]
+        if field in self.codes:
+            code = int(self.codes[field][row_id])
+            return self.dictionaries[field][code] if code >= 0 else None
+        value = self.numbers[field][row_id].item()
+        if isinstance(value, float):
+            return None if value != value else value
+        return None if value < 0 else value
+
+    def get(self, row_id: int) -> Dict:
+        """Return the place at row_id as a plain dict"""
+        return {field: self._value(field, row_id) for field in PLACE_FIELDS}
+
+    def take(self, rows) -> "PlaceStore":
+        """A new store holding the given rows, in that order"""
+        rows = np.asarray(rows, dtype=np.int64)
+        return PlaceStore(
+            {field: [values[row_id] for row_id in rows.tolist()] for field, values in self.strings.items()},
+            {field: codes[rows] for field, codes in self.codes.items()},
+            self.dictionaries,
+            {field: array[rows] for field, array in self.numbers.items()},
+        )
+
+    def save(self, path: str):
+        """Write the store as a directory of arrays"""
+        arrays = {**self.codes, **self.numbers}
+        for field, values in self.strings.items():
+            arrays[f"{field}.data"], arrays[f"{field}.offsets"] = StringColumn.encode(values)
+        artifact_io.save_arrays(path, arrays, {'rows': self.size, 'dictionaries': self.dictionaries}, FORMAT_VERSION)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return artifact_io.exists(path)
+
+    @classmethod
+    def load(cls, path: str) -> "PlaceStore":
+        """Memory-map a store written by save()"""
+        meta = artifact_io.load_meta(path, FORMAT_VERSION, "place store")
+        strings = {
+            field: StringColumn(artifact_io.load_array(path, f"{field}.data"),
+                                artifact_io.load_array(path, f"{field}.offsets"))
+            for field in STRING_FIELDS
+        }
+        codes = {field: artifact_io.load_array(path, field) for field in CATEGORICAL_FIELDS}
+        numbers = {field: artifact_io.load_array(path, field) for field in NUMERIC_FIELDS}
+        store = cls(strings, codes, meta['dictionaries'], numbers)
+        if store.size != meta['rows'] or any(len(values) != store.size for values in [*codes.values(), *numbers.values()]):
+            raise ValueError(f"Place store at {path} is inconsistent")
+        return store
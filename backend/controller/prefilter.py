@@ -0,0 +1,90 @@
+import numpy as np
+from typing import Dict, List, Optional
+from controller.place_store import PlaceStore
+
+
+# Thresholds that get a precomputed "value >= threshold" bitset
+RATING_STEPS = [round(step * 0.1, 1) for step in range(51)]
+REVIEW_STEPS = [0, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+def _normalize(value) -> str:
+    return str(value).strip().casefold()
+
+
+class PlacePrefilter:
+    """Precomputed bitsets over place metadata
+
+    One packed bitset (bit i = index row i) is kept per city, main category, type tag
+    and rating / review count threshold. A filter dict is resolved by intersecting the
+    matching bitsets into an allow-list of row ids before any vector is scored, so
+    every constraint holds and the top-k is taken from the matching places only.
+
+    Supported filter keys: city, main_category, types (comma separated, any tag
+    matches), min_rating and min_reviews. Other keys are ignored.
+    """
+    def __init__(self, places: PlaceStore):
+        self.size = len(places)
+        self.ratings = places.numbers['rating']
+        self.review_counts = np.maximum(places.numbers['user_rating_count'], 0)
+
+        self.cities = self._value_bitsets(places, 'city')
+        self.categories = self._value_bitsets(places, 'main_category')
+        self.types = self._value_bitsets(places, 'types', multi=True)
+        # NaN compares False, so unrated places never satisfy a rating threshold
+        self.rating_bitsets = {step: self._pack(self.ratings >= step) for step in RATING_STEPS}
+        self.review_bitsets = {step: self._pack(self.review_counts >= step) for step in REVIEW_STEPS}
+        self._empty = self._pack(np.zeros(self.size, dtype=bool))
+
+    def _pack(self, mask: np.ndarray) -> np.ndarray:
+        return np.packbits(mask)
+
+    def _unpack(self, bitset: np.ndarray) -> np.ndarray:
+        return np.unpackbits(bitset, count=self.size).astype(bool)
+
+    def _value_bitsets(self, places: PlaceStore, field: str, multi: bool = False) -> Dict[str, np.ndarray]:
+        """One bitset per distinct (normalized) value, or per comma separated tag when multi"""
+        value_codes = {}
+        for code, value in enumerate(places.values(field)):
+            tags = str(value).split(',') if multi else [value]
+            for tag in tags:
+                value_codes.setdefault(_normalize(tag), []).append(code)
+        codes = places.codes[field]
+        return {key: self._pack(np.isin(codes, matching)) for key, matching in value_codes.items()}
+
+    def _threshold_bitset(self, value: float, steps: List, bitsets: Dict, column: np.ndarray) -> np.ndarray:
+        """Bitset of rows with column >= value, refined exactly when value falls between steps"""
+        step = max((s for s in steps if s <= value), default=None)
+        if step is None:
+            return self._pack(column >= value)
+        if step == value:
+            return bitsets[step]
+        return np.bitwise_and(bitsets[step], self._pack(column >= value))
+
+    def bitset(self, filters: Optional[Dict]) -> Optional[np.ndarray]:
+        """Intersection of the bitsets selected by filters, None when nothing constrains the rows"""
+        selected = []
+        for key, value in (filters or {}).items():
+            if value is None or value == '':
+                continue
+            if key == 'city':
+                selected.append(self.cities.get(_normalize(value), self._empty))
+            elif key == 'main_category':
+                selected.append(self.categories.get(_normalize(value), self._empty))
+            elif key == 'types':
+                tags = [self.types.get(_normalize(tag), self._empty) for tag in str(value).split(',')]
+                selected.append(np.bitwise_or.reduce(tags))
+            elif key == 'min_rating':
+                selected.append(self._threshold_bitset(float(value), RATING_STEPS, self.rating_bitsets, self.ratings))
+            elif key == 'min_reviews':
+                selected.append(self._threshold_bitset(int(value), REVIEW_STEPS, self.review_bitsets, self.review_counts))
+        if not selected:
+            return None
+        return np.bitwise_and.reduce(selected)
+
+    def allowed_rows(self, filters: Optional[Dict]) -> Optional[np.ndarray]:
+        """Sorted row ids matching every filter, None when nothing constrains the rows"""
+        bitset = self.bitset(filters)
+        if bitset is None:
+            return None
+        return np.flatnonzero(self._unpack(bitset))
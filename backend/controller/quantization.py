@@ -0,0 +1,178 @@
+import os
+import math
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+def _save_npy(path: str, array: np.ndarray):
+    """Write an .npy file atomically so concurrent readers never see it half written"""
+    tmp_path = f"{path}.tmp-{os.getpid()}.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def take_rows(array: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+    """Select rows, slicing instead of copying when they form a contiguous block"""
+    if rows is None:
+        return array
+    if rows.size and rows[-1] - rows[0] + 1 == rows.size:
+        return array[rows[0]:rows[-1] + 1]
+    return array[rows]
+
+
+def _blockwise(codes: np.ndarray, score_block, block_size: int = 8192) -> np.ndarray:
+    """Score codes block by block so decoded float32 copies stay small"""
+    scores = np.empty(codes.shape[0], dtype=np.float32)
+    for start in range(0, codes.shape[0], block_size):
+        scores[start:start + block_size] = score_block(codes[start:start + block_size])
+    return scores
+
+
+class VectorCodec(ABC):
+    """Compressed copy of the embeddings matrix used to shortlist candidates
+
+    Codes live next to vectors.npy in the index artifact and are memory-mapped like it.
+    Scores are approximate inner products, the index re-ranks the shortlist exactly.
+    """
+    name = None
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_path, name)
+
+    @abstractmethod
+    def exists(self) -> bool:
+        """True when the codes files are in the artifact"""
+
+    @abstractmethod
+    def build(self, vectors: np.ndarray):
+        """Encode the float32 vectors and write the codes"""
+
+    @abstractmethod
+    def load(self):
+        """Memory-map the codes written by build()"""
+
+    def open(self) -> "VectorCodec":
+        """Load the codes, which build() wrote when the artifact was created"""
+        if not self.exists():
+            raise FileNotFoundError(f"No {self.name} codes in {self.index_path}")
+        self.load()
+        return self
+
+    @abstractmethod
+    def score(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate inner products of query with the given rows, all rows if None"""
+
+    @property
+    @abstractmethod
+    def nbytes(self) -> int:
+        """Size of the codes that have to stay resident for scoring"""
+
+
+class Float16Codec(VectorCodec):
+    """Half precision storage, 2 bytes per dimension"""
+    name = "fp16"
+
+    def exists(self) -> bool:
+        return os.path.isfile(self._path("codes_fp16.npy"))
+
+    def build(self, vectors: np.ndarray):
+        codes = np.empty(vectors.shape, dtype=np.float16)
+        for start in range(0, vectors.shape[0], 4096):
+            codes[start:start + 4096] = vectors[start:start + 4096]
+        _save_npy(self._path("codes_fp16.npy"), codes)
+
+    def load(self):
+        self.codes = np.load(self._path("codes_fp16.npy"), mmap_mode='r')
+
+    def score(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        return _blockwise(take_rows(self.codes, rows), lambda block: block.astype(np.float32) @ query)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+
+class SQ8Codec(VectorCodec):
+    """8 bit uniform scalar quantization per dimension, 1 byte per dimension
+
+    x ~= vmin + (code + 0.5) * step, so the inner product with a query reduces to
+    code @ (query * step) plus a per-query constant.
+    """
+    name = "sq8"
+
+    def exists(self) -> bool:
+        return all(os.path.isfile(self._path(name)) for name in ("codes_sq8.npy", "sq8_params.npy"))
+
+    def build(self, vectors: np.ndarray):
+        vmin = np.min(vectors, axis=0).astype(np.float32)
+        vmax = np.max(vectors, axis=0).astype(np.float32)
+        step = np.maximum(vmax - vmin, 1e-12) / 255.0
+        codes = np.empty(vectors.shape, dtype=np.uint8)
+        for start in range(0, vectors.shape[0], 4096):
+            block = (np.asarray(vectors[start:start + 4096]) - vmin) / step
+            codes[start:start + 4096] = np.clip(np.floor(block), 0, 255)
+        _save_npy(self._path("sq8_params.npy"), np.stack([vmin, step]))
+        _save_npy(self._path("codes_sq8.npy"), codes)
+
+    def load(self):
+        self.codes = np.load(self._path("codes_sq8.npy"), mmap_mode='r')
+        self.vmin, self.step = np.load(self._path("sq8_params.npy"))
+
+    def score(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        scaled = query * self.step
+        offset = float((self.vmin + 0.5 * self.step) @ query)
+        return _blockwise(take_rows(self.codes, rows), lambda block: block.astype(np.float32) @ scaled + offset)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+
+class PQCodec(VectorCodec):
+    """Product quantization: m sub-vectors of 8 bits each, m bytes per vector
+
+    m is reduced to a divisor of the embedding dimension when it does not divide it.
+    Scored with asymmetric distance computation, one (m, 256) lookup table per query.
+    """
+    name = "pq"
+
+    def __init__(self, index_path: str, m: int = 96):
+        super().__init__(index_path)
+        self.m = m
+
+    def exists(self) -> bool:
+        return all(os.path.isfile(self._path(name)) for name in ("codes_pq.npy", "pq_centroids.npy"))
+
+    def build(self, vectors: np.ndarray):
+        import faiss
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        pq = faiss.ProductQuantizer(vectors.shape[1], math.gcd(vectors.shape[1], self.m), 8)
+        pq.train(vectors)
+        centroids = faiss.vector_to_array(pq.centroids).reshape(pq.M, pq.ksub, pq.dsub)
+        _save_npy(self._path("pq_centroids.npy"), centroids)
+        _save_npy(self._path("codes_pq.npy"), pq.compute_codes(vectors))
+
+    def load(self):
+        self.codes = np.load(self._path("codes_pq.npy"), mmap_mode='r')
+        self.centroids = np.load(self._path("pq_centroids.npy"))
+
+    def score(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        m, _, dsub = self.centroids.shape
+        table = np.einsum('msd,md->ms', self.centroids, query.reshape(m, dsub))
+        sub = np.arange(m)
+        return _blockwise(take_rows(self.codes, rows), lambda block: table[sub, block].sum(axis=1))
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.centroids.nbytes
+
+
+CODECS = {
+    Float16Codec.name: Float16Codec,
+    SQ8Codec.name: SQ8Codec,
+    PQCodec.name: PQCodec,
+}
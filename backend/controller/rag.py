@@ -1,22 +1,98 @@
+import io
 import os
 import json
-import pandas as pd
-import hashlib
+import time
+import numpy as np
 import traceback
 from uuid import UUID
 from sqlalchemy.orm import Session
-from typing import List, Dict, Optional, Tuple
+from typing import TYPE_CHECKING, AsyncIterator, List, Dict, NamedTuple, Optional, Tuple
 from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.utils.json import parse_json_markdown
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 from langchain_core.messages import HumanMessage, AIMessage
 from controller import EmbeddingsError, DataLoadError, APIKeyError, RAGError, SearchError, ResponseGenerationError, DatabaseError
 from controller.database import Session as db_session
+from controller.place_store import PlaceStore
+from controller.dataset_manifest import DatasetManifest
+from controller.embedding_cache import QueryEmbeddingCache
+from controller.response_cache import SemanticResponseCache
+from controller.embedding_store import DocumentEmbeddingStore
+from controller.embedding_builder import EmbeddingBuildPipeline
+from controller.lexical_index import tokenize, reciprocal_rank_fusion
+from controller.vector_index import PlacesVectorIndex
+from controller.index_watcher import IndexWatcher
+from controller import structured_answer
 from models.chat import Message
 
+if TYPE_CHECKING:
+    # pandas is only needed to build an index, serving processes never import it
+    import pandas as pd
+
+
+# Relevant places considered per returned place when a query asks for the best ones
+RATING_POOL_FACTOR = 2
+
+# Prompt around the response rules and format, see RAGPipeline.build_response_template
+SYSTEM_PROMPT_HEAD = """You are a helpful places recommender assistant for locations in Pakistan.  
+            Only respond based on the provided relevent places and filters. **Do not invent places.**  
+
+"""
+SYSTEM_PROMPT_TAIL = """            **Filter Actions:**  
+            - **update** → User specifies new/modified filters.  
+            - **clear** → User resets search.  
+            - **keep** → User refines existing filters or follows up.  
+
+            **Query Interpretation:**  
+            - **Location-related** → Update `city`.  
+            - **Category mention** → Update `main_category`.  
+            - **Feature requests** → Update `types`.  
+            - **Quality mentions** → Update `min_rating`.  
+            - Maintain filters unless explicitly changed.  
+
+            **Error Handling:**  
+            - Out-of-Pakistan queries → Explain limitation.  
+            - Ambiguous queries → Ask clarifying questions.  
+            - No results → Suggest broader search criteria.  
+            """
+USER_PROMPT = """
+                User Query: {query}
+                Relevent places: {context}  
+                Current Filters: {current_filters}    
+                Chat History: {chat_history}
+            """
+
+# The LLM picks places by id, their records are hydrated from the index
+RESPONSE_RULES = """            ### **Response Rules**:
+            1. **If places are available**, choose up to {n_places}, prioritizing higher ratings and review counts.
+            2. **If no places match**, return an empty `"place_ids"` list with an appropriate `"message"`. **Do not generate fake places.**
+            3. **Do not assume information**—base responses strictly on provided data.
+            4. **Refer to places by id only**: copy the `"id"` of every chosen place from the relevent places into `"place_ids"`, best first. Their details are added for you.
+
+"""
+RESPONSE_FORMAT = """            ### **Response Format**:
+            ```json
+                {{  
+                "message": "Conversational response explaining results",  
+                "place_ids": ["id of a chosen place"],  
+                "context": "Relevant prior conversation context",  
+                "applied_filters": {{  
+                    "city": "string | null",  
+                    "main_category": "string | null",  
+                    "types": "string | null",  
+                    "min_rating": float | null  
+                }},  
+                "filter_action": "update | clear | keep"  
+            }}    
+
+"""
+
+# Columns final_df.csv has to provide
+CSV_COLUMNS = ['id', 'displayName', 'formattedAddress', 'lat', 'lng', 'types', 'rating', 'userRatingCount', 'city', 'main_category']
+
 
 class Place(BaseModel):
     """Pydantic model for a single place"""
@@ -52,89 +128,335 @@ class QueryResponse(BaseModel):
     applied_filters: Optional[Dict] = Field(default_factory=dict, description="Filters applied to the query")
     filter_action: Optional[str] = Field(default="keep", description="Filter action: update/clear/keep")
 
+class LLMAnswer(BaseModel):
+    """What the LLM returns, place records are hydrated from the index by id"""
+    message: str = Field(..., description="A natural language summary of the results")
+    place_ids: List[str] = Field(default_factory=list, description="Ids of the chosen places, best first")
+    context: Optional[str] = Field(None, description="Context from previous conversation if relevant")
+    applied_filters: Optional[Dict] = Field(default_factory=dict, description="Filters applied to the query")
+    filter_action: Optional[str] = Field(default="keep", description="Filter action: update/clear/keep")
+
+class AnswerPlan(NamedTuple):
+    """Everything decided about a query before the LLM is called"""
+    structured: Optional[QueryResponse]  # set when no LLM call is needed
+    relevant_docs: List[Document]
+    filters: Dict
+    filter_action: str
+    inputs: Dict  # prompt inputs, empty for structured answers
+    index_version: str
+    query: str = ''
+    query_vector: Optional[List[float]] = None  # None when retrieval needed no embedding
+
 class PlacesEmbeddingsGenerator:
-    """Handles creation and management of embeddings for places data"""
-    def __init__(self, embeddings_dir: str = "controller/embeddings"):
+    """Handles creation and management of embeddings for places data
+
+    index_type picks how the index is searched: "flat" (exact float32) or one of the
+    compressed codecs "fp16", "sq8" and "pq", which shortlist on codes and re-rank exactly.
+    build_chunk_size and build_concurrency tune the EmbeddingBuildPipeline used for new documents.
+    import_legacy_pickle seeds the document store from an old pickled FAISS store of the same
+    CSV; it unpickles that directory, so only enable it for files you produced yourself.
+    """
+    def __init__(self, embeddings_dir: str = "controller/embeddings", index_type: str = "flat",
+                 build_chunk_size: int = 500, build_concurrency: int = 4, import_legacy_pickle: bool = False):
         try:
             self.embeddings_dir = embeddings_dir
+            self.index_type = index_type
+            self.build_chunk_size = build_chunk_size
+            self.build_concurrency = build_concurrency
+            self.import_legacy_pickle = import_legacy_pickle
             self.embeddings = OpenAIEmbeddings()
             os.makedirs(embeddings_dir, exist_ok=True)
+            self.manifest = DatasetManifest(os.path.join(embeddings_dir, "dataset_manifest.json"))
         except Exception as e:
             print(traceback.format_exc(1))
             raise EmbeddingsError(f"Failed to initialize embeddings generator: {str(e)}")
     
-    def _get_embeddings_path(self, csv_path: str) -> str:
-        """Generate a unique path for embeddings based on CSV content hash"""
-        with open(csv_path, 'rb') as f:
-            csv_hash = hashlib.md5(f.read()).hexdigest()
+    def _get_dataset(self, csv_path: str) -> Tuple[str, Optional[bytes]]:
+        """Hash of the CSV, plus its content when the file had to be read to get it"""
+        csv_hash = self.manifest.lookup(csv_path)
+        if csv_hash is not None:
+            return csv_hash, None
+        return self.manifest.read(csv_path)
+
+    def _get_embeddings_path(self, csv_hash: str) -> str:
+        """Path of an index saved by the previous FAISS.save_local based format"""
         return os.path.join(self.embeddings_dir, f"places_embeddings_{csv_hash}")
-    
-    def _create_documents(self, df: pd.DataFrame) -> List[Document]:
-        """Create document objects from DataFrame rows"""
-        documents = []
-        for _, row in df.iterrows():
-            place = Place(
-                id=str(row['id']),
-                display_name=row['displayName'],
-                formatted_address=row['formattedAddress'],
-                lat=float(row['lat']),
-                lng=float(row['lng']),
-                types=row['types'] if pd.notnull(row['types']) else None,
-                rating=row['rating'] if pd.notnull(row['rating']) else None,
-                user_rating_count=int(row['userRatingCount']) if pd.notnull(row['userRatingCount']) else None,
-                city=row['city'],
-                main_category=row['main_category']
-            )
-            
-            content = f"""
-            Name: {place.display_name}
-            Address: {place.formatted_address}
-            City: {place.city}
-            main_category: {place.main_category}
-            Type: {place.types if place.types else 'Not specified'}
-            Rating: {place.rating if place.rating else 'No rating'} ({place.user_rating_count if place.user_rating_count else 0} reviews)
+
+    def _get_store_path(self) -> str:
+        """Per-document embeddings shared by every index version"""
+        return os.path.join(self.embeddings_dir, "document_embeddings.sqlite")
+
+    @staticmethod
+    def _render_contents(columns: Dict[str, List]) -> List[str]:
+        """Text that gets embedded, for every place of a set of per-field value lists"""
+        return [
+            f"""
+            Name: {display_name}
+            Address: {formatted_address}
+            City: {city}
+            main_category: {main_category}
+            Type: {types if types else 'Not specified'}
+            Rating: {rating if rating else 'No rating'} ({user_rating_count if user_rating_count else 0} reviews)
             """
-            
-            metadata = place.model_dump()
-            documents.append(Document(page_content=content, metadata=metadata))
-        
-        return documents
+            for display_name, formatted_address, city, main_category, types, rating, user_rating_count in zip(
+                columns['display_name'], columns['formatted_address'], columns['city'], columns['main_category'],
+                columns['types'], columns['rating'], columns['user_rating_count'])
+        ]
+
+    @staticmethod
+    def _render_content(place: Dict) -> str:
+        """Text that gets embedded for a place"""
+        return PlacesEmbeddingsGenerator._render_contents({key: [value] for key, value in place.items()})[0]
+
+    @staticmethod
+    def _column(series: "pd.Series") -> List:
+        """Column as a list of Python values, with None for missing ones"""
+        return series.astype(object).where(series.notna(), None).tolist()
+
+    @classmethod
+    def _create_documents(cls, df: "pd.DataFrame") -> Tuple[List[str], PlaceStore]:
+        """Validate the DataFrame column by column and render every document in bulk
+
+        Returns the document texts and the place columns, row i of both describing the same place.
+        """
+        import pandas as pd
+        missing_columns = [column for column in CSV_COLUMNS if column not in df.columns]
+        if missing_columns:
+            raise DataLoadError(f"CSV is missing columns: {', '.join(missing_columns)}")
+
+        def invalid(mask: "pd.Series", column: str):
+            if mask.any():
+                rows = [int(row) for row in df.index[mask][:5]]
+                raise DataLoadError(f"Invalid or missing '{column}' in CSV rows {rows}")
+
+        for column in ('id', 'displayName', 'formattedAddress', 'city', 'main_category'):
+            invalid(df[column].isna(), column)
+        numbers = {}
+        for column in ('lat', 'lng', 'rating', 'userRatingCount'):
+            numbers[column] = pd.to_numeric(df[column], errors='coerce')
+            # Coordinates are required, rating and review count may be missing but not malformed
+            invalid(numbers[column].isna() & (df[column].notna() | (column in ('lat', 'lng'))), column)
+        counts = numbers['userRatingCount']
+        invalid(counts.notna() & (counts % 1 != 0), 'userRatingCount')
+
+        columns = {
+            'id': df['id'].astype(str).tolist(),
+            'display_name': df['displayName'].astype(str).tolist(),
+            'formatted_address': df['formattedAddress'].astype(str).tolist(),
+            'lat': numbers['lat'].astype(float).tolist(),
+            'lng': numbers['lng'].astype(float).tolist(),
+            'types': cls._column(df['types'].where(df['types'].isna(), df['types'].astype(str))),
+            'rating': cls._column(numbers['rating'].astype(float)),
+            'user_rating_count': cls._column(counts.astype('Int64')),
+            'city': df['city'].astype(str).tolist(),
+            'main_category': df['main_category'].astype(str).tolist(),
+        }
+        return cls._render_contents(columns), PlaceStore.from_columns(columns)
+
+    def _deduplicate(self, df: "pd.DataFrame") -> "pd.DataFrame":
+        """Collapse rows sharing a place id into one row
+
+        Per id the primary row is the one whose city appears in its address, then the
+        one with most reviews, then the first in file order. Its values win; missing
+        types, rating or review count are filled from the other rows in the same order.
+        """
+        df = df.assign(
+            _order=range(len(df)),
+            _city_in_address=[
+                str(city).casefold() in str(address).casefold()
+                for city, address in zip(df['city'], df['formattedAddress'])
+            ],
+        )
+        df = df.sort_values(
+            ['_city_in_address', 'userRatingCount', '_order'],
+            ascending=[False, False, True],
+            na_position='last',
+            kind='stable',
+        )
+        # groupby().first() takes the first non-null value per column in that order
+        merged = df.groupby('id', sort=False).first().reset_index()
+        merged = merged.sort_values('_order', kind='stable')
+        return merged.drop(columns=['_order', '_city_in_address']).reset_index(drop=True)
 
-    def generate_or_load_vectorstore(self, csv_path: str) -> FAISS:
-        """Create or load vector store from places data"""
+    def _load_legacy_vectors(self, legacy_path: str) -> Dict[str, List[float]]:
+        """Vectors of a pickled LangChain FAISS store, keyed by the embedded document text"""
+        from langchain_community.vectorstores import FAISS
+        vectorstore = FAISS.load_local(legacy_path, self.embeddings, allow_dangerous_deserialization=True)
+        vectors = vectorstore.index.reconstruct_n(0, vectorstore.index.ntotal)
+        return {
+            vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]).page_content: vectors[i]
+            for i in range(vectorstore.index.ntotal)
+        }
+
+    def _get_versions_dir(self) -> str:
+        return os.path.join(self.embeddings_dir, "versions")
+
+    def _get_current_path(self) -> str:
+        """Pointer file naming the published index version"""
+        return os.path.join(self.embeddings_dir, "CURRENT")
+
+    def get_published_index_path(self) -> Optional[str]:
+        """Artifact directory of the published index version, None when nothing was published"""
         try:
-            embeddings_path = self._get_embeddings_path(csv_path)
-            
+            with open(self._get_current_path(), 'r', encoding='utf-8') as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        index_path = os.path.join(self._get_versions_dir(), version)
+        return index_path if version and PlacesVectorIndex.exists(index_path) else None
+
+    def publish(self, index_path: str):
+        """Atomically point CURRENT at a built index version"""
+        tmp_path = f"{self._get_current_path()}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(os.path.basename(os.path.normpath(index_path)))
+        os.replace(tmp_path, self._get_current_path())
+
+    def _embed_contents(self, contents: List[str], csv_hash: str) -> Tuple[List, int]:
+        """Vectors for the contents, embedding only texts the store does not have yet"""
+        store = DocumentEmbeddingStore(self._get_store_path(), model=str(getattr(self.embeddings, 'model', '')))
+        texts = list(dict.fromkeys(contents))
+        known_vectors = store.get_many(texts)
+
+        # Seed the store from the old pickled format instead of paying for those vectors again
+        legacy_path = self._get_embeddings_path(csv_hash)
+        if self.import_legacy_pickle and len(known_vectors) < len(texts) and os.path.isdir(legacy_path):
             try:
-                print(f"Loading embeddings from {embeddings_path}")
-                vectorstore = FAISS.load_local(embeddings_path, self.embeddings, allow_dangerous_deserialization=True)
-                print("Successfully loaded existing embeddings")
-                return vectorstore
-            except Exception as load_error:
-                print(f"Creating new embeddings (reason: {str(load_error)})")
-                df = pd.read_csv(csv_path)
-                documents = self._create_documents(df)
-                print(f"Generated {len(documents)} documents")
-                vectorstore = FAISS.from_documents(documents, self.embeddings)
-                print("Successfully created new embeddings")
-                os.makedirs(embeddings_path, exist_ok=True)
-                vectorstore.save_local(embeddings_path)
-                print(f"Saved new embeddings to {embeddings_path}")
-                return vectorstore
-                
+                legacy_vectors = self._load_legacy_vectors(legacy_path)
+                reused = [text for text in texts if text not in known_vectors and text in legacy_vectors]
+                store.put_many(reused, [legacy_vectors[text] for text in reused])
+                known_vectors.update((text, legacy_vectors[text]) for text in reused)
+                print(f"Reused {len(reused)} legacy embeddings from {legacy_path}")
+            except Exception as legacy_error:
+                print(f"Could not read legacy embeddings (reason: {str(legacy_error)})")
+
+        missing = [text for text in texts if text not in known_vectors]
+        if missing:
+            # Chunks are checkpointed into the store, a failed build resumes where it stopped
+            pipeline = EmbeddingBuildPipeline(
+                self.embeddings, store, chunk_size=self.build_chunk_size, max_workers=self.build_concurrency)
+            known_vectors.update(pipeline.run(missing))
+        store.close()
+        print(f"Successfully created new embeddings ({len(missing)} embedded, {len(texts) - len(missing)} reused)")
+        return [known_vectors[content] for content in contents], len(missing)
+
+    def build_index(self, csv_path: str, codecs=(), publish: bool = True, force: bool = False) -> str:
+        """Build a new read-only index version from the CSV and return its path
+
+        When the published version was built from the same CSV and already has the
+        requested codecs it is kept, unless force is set.
+        """
+        import pandas as pd
+        try:
+            started = time.time()
+            csv_hash, data = self._get_dataset(csv_path)
+            codecs = sorted(set(codecs) - {"flat"})
+            published = self.get_published_index_path()
+            if published and not force:
+                manifest = PlacesVectorIndex.read_manifest(published)
+                if manifest.get('csv_md5') == csv_hash and set(codecs) <= set(manifest.get('codecs', [])):
+                    print(f"Published index {published} is up to date")
+                    return published
+
+            print("Creating new embeddings")
+            if data is None:
+                csv_hash, data = self.manifest.read(csv_path)
+            df = pd.read_csv(io.BytesIO(data))
+            source_rows = len(df)
+            df = self._deduplicate(df)
+            contents, places = self._create_documents(df)
+            print(f"Generated {len(contents)} documents")
+            vectors, embedded = self._embed_contents(contents, csv_hash)
+
+            version = f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{csv_hash[:12]}"
+            index_path = os.path.join(self._get_versions_dir(), version)
+            os.makedirs(self._get_versions_dir(), exist_ok=True)
+            stat = os.stat(csv_path)
+            manifest = {
+                'version': version,
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'csv_path': os.path.realpath(csv_path),
+                'csv_md5': csv_hash,
+                'csv_size': stat.st_size,
+                'csv_mtime_ns': stat.st_mtime_ns,
+                'embedding_model': str(getattr(self.embeddings, 'model', '')),
+            }
+            ratings = places.numbers['rating']
+            stats = {
+                'source_rows': source_rows,
+                'places': len(places),
+                'cities': len(places.values('city')),
+                'main_categories': {
+                    category: int(count) for category, count in zip(
+                        places.values('main_category'),
+                        np.bincount(places.codes['main_category'][places.codes['main_category'] >= 0],
+                                    minlength=len(places.values('main_category'))))
+                },
+                'rated_places': int(np.count_nonzero(~np.isnan(ratings))),
+                'documents_embedded': embedded,
+                'documents_reused': len(set(contents)) - embedded,
+                'embedding_seconds': round(time.time() - started, 1),
+            }
+            vectorstore = PlacesVectorIndex.build(
+                index_path, vectors, places, index_type="flat", codecs=codecs,
+                manifest=manifest, stats=stats, read_only=True)
+            print(f"Saved new embeddings to {index_path} ({len(vectorstore)} places, {time.time() - started:.1f}s)")
+            if publish:
+                self.publish(index_path)
+                print(f"Published index version {version}")
+            return index_path
+
+        except RAGError:
+            print(traceback.format_exc(1))
+            raise
+        except FileNotFoundError:
+            print(traceback.format_exc(1))
+            raise DataLoadError(f"CSV file not found: {csv_path}")
         except pd.errors.EmptyDataError:
             print(traceback.format_exc(1))
             raise DataLoadError("CSV file is empty")
         except pd.errors.ParserError:
             print(traceback.format_exc(1))
             raise DataLoadError("Invalid CSV format")
+        except Exception as e:
+            print(traceback.format_exc(1))
+            raise EmbeddingsError(f"Failed to build places index: {str(e)}")
+
+    def generate_or_load_vectorstore(self, csv_path: str, allow_build: bool = True) -> PlacesVectorIndex:
+        """Open the published places index
+
+        Without a published version one is built inline when allow_build is set.
+        Servers run with allow_build=False and rely on build_index.py having published
+        a version.
+        """
+        try:
+            index_path = self.get_published_index_path()
+            if index_path is None:
+                if not allow_build:
+                    raise EmbeddingsError(
+                        f"No published places index in {self.embeddings_dir}, "
+                        f"run `python build_index.py --csv {csv_path}` first")
+                index_path = self.build_index(csv_path, codecs=[self.index_type])
+
+            print(f"Loading embeddings from {index_path}")
+            vectorstore = PlacesVectorIndex(index_path, index_type=self.index_type)
+            print("Successfully loaded existing embeddings")
+            return vectorstore
+
+        except RAGError:
+            print(traceback.format_exc(1))
+            raise
         except Exception as e:
             print(traceback.format_exc(1))
             raise EmbeddingsError(f"Failed to generate or load vectorstore: {str(e)}")
 
 class RAGPipeline:
     """Main RAG system integrated with database"""
-    def __init__(self, csv_path: str, openai_api_key: str, embeddings_dir: str = "controller/embeddings"):
+    def __init__(self, csv_path: str, openai_api_key: str, embeddings_dir: str = "controller/embeddings", index_type: str = "flat",
+                 query_cache_size: int = 10000, query_cache_ttl: float = 7 * 24 * 3600, query_cache_path: Optional[str] = None,
+                 allow_index_build: bool = True, index_watch_interval: float = 0, index_drain_seconds: float = 60.0,
+                 filter_min_confidence: float = 0.8, structured_answers: bool = True,
+                 response_cache_size: int = 1000, response_cache_ttl: float = 24 * 3600, response_cache_similarity: float = 0.92):
         try:
             if not openai_api_key:
                 print(traceback.format_exc(1))
@@ -144,36 +466,46 @@ class RAGPipeline:
             os.environ['OPENAI_API_KEY'] = openai_api_key
             
             # Initialize components
-            self.llm = ChatOpenAI(model_name="gpt-4o", temperature=0.1)
-            self.output_parser = PydanticOutputParser(pydantic_object=QueryResponse)
+            # stream_usage: token counts are reported for streamed answers too
+            self.llm = ChatOpenAI(model_name="gpt-4o", temperature=0.1, stream_usage=True)
+            self.output_parser = PydanticOutputParser(pydantic_object=LLMAnswer)
             
-            # Load and process data
-            try:
-                self.df = pd.read_csv(csv_path)
-                if self.df.empty:
-                    print(traceback.format_exc(1))
-                    raise DataLoadError("CSV file is empty")
-                
-                self.valid_cities = set(self.df['city'].unique())
-                self.valid_categories = set(self.df['main_category'].unique())
-                self.valid_types = set(self.df['types'].dropna().unique())
-                
-            except FileNotFoundError:
-                print(traceback.format_exc(1))
-                raise DataLoadError(f"CSV file not found: {csv_path}")
-            except pd.errors.EmptyDataError:
+            # Generate or load embeddings
+            embeddings_generator = PlacesEmbeddingsGenerator(embeddings_dir, index_type=index_type)
+            self.embeddings = QueryEmbeddingCache(
+                embeddings_generator.embeddings,
+                max_size=query_cache_size,
+                ttl_seconds=query_cache_ttl,
+                disk_path=query_cache_path)
+            self.vectorstore = embeddings_generator.generate_or_load_vectorstore(csv_path, allow_build=allow_index_build)
+            if not len(self.vectorstore):
                 print(traceback.format_exc(1))
                 raise DataLoadError("CSV file is empty")
-            except pd.errors.ParserError:
-                print(traceback.format_exc(1))
-                raise DataLoadError("Invalid CSV format")
             
-            # Generate or load embeddings
-            embeddings_generator = PlacesEmbeddingsGenerator(embeddings_dir)
-            self.vectorstore = embeddings_generator.generate_or_load_vectorstore(csv_path)
+            self.retrieval_stats = {'lexical': 0, 'hybrid': 0, 'vector': 0}
+            # Fuzzy city / category matches below this confidence are not applied as filters
+            self.filter_min_confidence = filter_min_confidence
+            self.filter_stats = {'exact': 0, 'fuzzy_applied': 0, 'fuzzy_rejected': 0}
+            # Queries fully described by their filters are answered without the LLM
+            self.structured_answers = structured_answers
+            self.routing_stats = {'structured': 0, 'llm': 0}
+            # unknown_place_ids = ids the LLM returned that were not among the relevant places
+            self.llm_stats = {'calls': 0, 'output_tokens': 0, 'seconds': 0.0, 'unknown_place_ids': 0}
+            # Generated answers reused for near-identical questions, 0 = disabled
+            self.response_cache = None
+            if response_cache_size > 0:
+                self.response_cache = SemanticResponseCache(
+                    max_size=response_cache_size, ttl_seconds=response_cache_ttl, threshold=response_cache_similarity)
             self.db_manager: Session = db_session()
             self.setup_prompt_templates()
             
+            # Poll for newly published index versions and swap them in without a restart
+            self.index_watcher = None
+            if index_watch_interval > 0:
+                self.index_watcher = IndexWatcher(
+                    self, embeddings_generator, poll_seconds=index_watch_interval, drain_seconds=index_drain_seconds)
+                self.index_watcher.start()
+            
         except RAGError:
             print(traceback.format_exc(1))
             raise
@@ -181,124 +513,53 @@ class RAGPipeline:
             print(traceback.format_exc(1))
             raise RAGError(f"Failed to initialize RAG system: {str(e)}", "INITIALIZATION_ERROR")
 
-    def setup_prompt_templates(self):
-        """Setup prompt templates for query processing"""
-        self.response_template = ChatPromptTemplate.from_messages([
-            ("system", """You are a helpful places recommender assistant for locations in Pakistan.  
-            Only respond based on the provided relevent places and filters. **Do not invent places.**  
+    def swap_index(self, index: PlacesVectorIndex) -> PlacesVectorIndex:
+        """Make index the live one and return the previous index
 
-            ### **Response Rules**:
-            1. **If places are available**, return up to {n_places}, prioritizing higher ratings and review counts.
-            2. **If no places match**, return an empty `"places"` list with an appropriate `"message"`. **Do not generate fake places.**
-            3. **Do not assume information**—base responses strictly on provided data.
-
-            ### **Response Format**:
-            ```json
-                {{  
-                "message": "Conversational response explaining results",  
-                "places": [  
-                    {{  
-                        "place_id": "unique identifier",  
-                        "name": "place name",  
-                        "address": "full address",  
-                        "lat": float | null,  
-                        "lng": float | null,  
-                        "city": "city name",  
-                        "main_category": "public places | restaurants | hotels | mosques or masjid",  
-                        "types": "comma-separated subcategories | null",  
-                        "rating": float | null,  
-                        "review_count": int | null  
-                    }}  
-                ],  
-                "context": "Relevant prior conversation context",  
-                "applied_filters": {{  
-                    "city": "string | null",  
-                    "main_category": "string | null",  
-                    "types": "string | null",  
-                    "min_rating": float | null  
-                }},  
-                "filter_action": "update | clear | keep"  
-            }}    
+        A single reference assignment: every request reads self.vectorstore once and
+        keeps using that index, so it never mixes rows of two versions.
+        """
+        old, self.vectorstore = self.vectorstore, index
+        return old
 
-            **Filter Actions:**  
-            - **update** → User specifies new/modified filters.  
-            - **clear** → User resets search.  
-            - **keep** → User refines existing filters or follows up.  
+    def stats(self) -> Dict:
+        """Runtime counters of the pipeline's caches"""
+        return {
+            'embedding_cache': self.embeddings.stats(),
+            # lexical = answered without an embedding call
+            'retrieval': dict(self.retrieval_stats),
+            'filters': dict(self.filter_stats),
+            'response_cache': self.response_cache.stats() if self.response_cache else None,
+            'llm': {
+                **self.llm_stats,
+                'avg_output_tokens': self.llm_stats['output_tokens'] / max(self.llm_stats['calls'], 1),
+                'avg_latency_ms': self.llm_stats['seconds'] / max(self.llm_stats['calls'], 1) * 1000,
+            },
+            'routing': {
+                **self.routing_stats,
+                'structured_rate': self.routing_stats['structured'] / max(sum(self.routing_stats.values()), 1),
+            },
+            'index': {
+                'version': self.vectorstore.version,
+                **(self.index_watcher.stats() if self.index_watcher else {}),
+            },
+        }
 
-            **Query Interpretation:**  
-            - **Location-related** → Update `city`.  
-            - **Category mention** → Update `main_category`.  
-            - **Feature requests** → Update `types`.  
-            - **Quality mentions** → Update `min_rating`.  
-            - Maintain filters unless explicitly changed.  
+    def close(self):
+        if self.index_watcher is not None:
+            self.index_watcher.stop()
 
-            **Error Handling:**  
-            - Out-of-Pakistan queries → Explain limitation.  
-            - Ambiguous queries → Ask clarifying questions.  
-            - No results → Suggest broader search criteria.  
-            """),
+    def setup_prompt_templates(self):
+        """Setup prompt templates for query processing"""
+        self.response_template = self.build_response_template(RESPONSE_RULES, RESPONSE_FORMAT)
 
-                ("user", """
-                User Query: {query}
-                Relevent places: {context}  
-                Current Filters: {current_filters}    
-                Chat History: {chat_history}
-            """)
-            ])
-
-        # self.response_template = ChatPromptTemplate.from_messages([
-        #     ("system", """You are a helpful places recommender assistant that provides information about places and locations in Pakistan.
-        #     You must:
-        #     1. Respond in the following JSON format:
-
-        #     {{
-        #         "message": "A natural language summary of the results, including feedback about invalid query or out of scope if any",
-        #         "places": [
-        #             {{
-        #                 "place_id": "unique identifier",
-        #                 "name": "place name",
-        #                 "address": "full address",
-        #                 "lat": "float or null. place latitude",
-        #                 "lng": "float or null place longitude",
-        #                 "city": "city name",
-        #                 "main_category": "main category",
-        #                 "types": "type string or null. tags for the place",
-        #                 "rating": "float or null. place rating",
-        #                 "review_count": "int or null. number of reviews"
-        #             }}
-        #         ],
-        #         "context": "Reference to previous conversation if relevant",
-        #         "applied_filters": {{
-        #             "city": string or null = identified city from query,
-        #             "main_category": string or null = (selcted from: public places, restaurants, hotels, mosques or masjid),
-        #             "types": string or null,
-        #             "min_rating": float or null
-        #         }},
-        #         "filter_action": "update/clear/keep"
-        #     }}
-        #     2. Prioritize the most relevant and up-to-date data provided in the current query and context over chat history.
-        #     3. if no context places provided, return an empty places list and an appropriate message.
-        #     4. Use chat history only to maintain continuity if it aligns with the current query.
-        #     5. Provide responses in the specified JSON format.
-        #     6. Include only relevant places (max {n_places}), focusing on data directly related to the query and filters.
-        #     7. If no matching places are found, return an empty places list and an appropriate message.
-        #     8. Keep any valid filters for future use, and also update if some filter is missing.
-        #     9. Set filter_action appropriately based on the user's query and current filters.
-        #     10. Handle null values gracefully in all fields."""),
-        #     ("user", """
-        #         Chat History:
-        #         {chat_history}
-
-        #         Context about places:
-        #         {context}
-
-        #         Current filters in use:
-        #         {current_filters}
-
-        #         User Query: {query}
-        #         """)
-        #     ]
-        # )
+    @staticmethod
+    def build_response_template(response_rules: str, response_format: str) -> ChatPromptTemplate:
+        """The answer prompt with the given response rules and format sections"""
+        return ChatPromptTemplate.from_messages([
+            ("system", SYSTEM_PROMPT_HEAD + response_rules + response_format + SYSTEM_PROMPT_TAIL),
+            ("user", USER_PROMPT)
+        ])
 
     async def get_chat_history(self, session_id: UUID, limit: int = 6) -> List[Dict]:
         """Get recent chat history for a session"""
@@ -333,81 +594,22 @@ class RAGPipeline:
         return any(phrase in query.lower() for phrase in reset_phrases)
     
 
-    def _validate_and_extract_filters(self, query: str, current_filters: Dict) -> Dict:
+    def _validate_and_extract_filters(self, query: str, current_filters: Dict, index: Optional[PlacesVectorIndex] = None) -> Dict:
         """Extract and validate filters dynamically while retaining existing ones."""
-        query_lower = query.lower()
-        valid_filters = current_filters.copy()
-        
-        # Define category mappings with synonyms and subcategories
-        category_mapping = {
-            'public places': [
-                'park', 'parks', 'garden', 'gardens', 'plaza', 'square', 'museum', 
-                'gallery', 'beach', 'beaches', 'landmark', 'monuments', 'library',
-                'public space', 'community center', 'playground'
-            ],
-            'restaurants': [
-                'eatery', 'cafe', 'diner', 'dining', 'bistro', 'food', 'fast food',
-                'pizzeria', 'steakhouse', 'bakery', 'coffee shop', 'bar', 'pub',
-                'buffet', 'grill', 'bbq', 'seafood place'
-            ],
-            'hotels': [
-                'motel', 'inn', 'resort', 'lodge', 'accommodation', 'stay', 'hostel',
-                'guesthouse', 'bed and breakfast', 'b&b', 'airbnb', 'apartment',
-                'lodging', 'place to stay'
-            ],
-            'mosques': [
-                'masjid', 'mosque', 'islamic center', 'prayer hall', 'prayer room',
-                'jummah', 'religious place', 'worship place'
-            ]
-        }
-        
-        # Define other filter mappings
-        filter_mapping = {
-            'city': self.valid_cities,
-            'types': self.valid_types,
-        }
-        
-        # Check for main_category using the expanded mapping
-        for main_category, synonyms in category_mapping.items():
-            # Check if the main category itself is in the query
-            if main_category.lower() in query_lower:
-                valid_filters['main_category'] = main_category
-                break
-                
-            # Check if any synonym is in the query
-            for synonym in synonyms:
-                if synonym.lower() in query_lower:
-                    valid_filters['main_category'] = main_category
-                    break
-            
-            # If we found a match, no need to check other categories
-            if valid_filters.get('main_category') == main_category:
-                break
-        
-        # Process other filters normally
-        for filter_key, valid_values in filter_mapping.items():
-            detected_value = next(
-                (value for value in valid_values if value.lower() in query_lower), 
-                None
-            )
-            # Update only if a valid value is detected
-            if detected_value:
-                valid_filters[filter_key] = detected_value
-        
-        # Add additional custom rules
-        custom_rules = [
-            {
-                'keywords': ['best', 'top', 'highest rated'],
-                'filter_key': 'min_rating',
-                'value': 4.0,
-            },
-            # Add more custom rules as needed
-        ]
-        
-        for rule in custom_rules:
-            if any(keyword in query_lower for keyword in rule['keywords']):
-                valid_filters[rule['filter_key']] = rule['value']
-        
+        # Cities, categories, types and rating rules are matched in one pass by the
+        # index's precompiled matcher (see controller.filter_matcher)
+        matcher = (index or self.vectorstore).filter_matcher
+        valid_filters = matcher.canonical(current_filters)
+        for key, (value, confidence) in matcher.resolve(query).items():
+            if confidence >= 1.0:
+                self.filter_stats['exact'] += 1
+            elif confidence >= self.filter_min_confidence:
+                # A misspelled city or category, close enough to trust
+                self.filter_stats['fuzzy_applied'] += 1
+            else:
+                self.filter_stats['fuzzy_rejected'] += 1
+                continue
+            valid_filters[key] = value
         return valid_filters
     # def _validate_and_extract_filters(self, query: str, current_filters: Dict) -> Dict:
     #     """Extract and validate filters dynamically while retaining existing ones."""
@@ -472,84 +674,251 @@ class RAGPipeline:
     #     except Exception as e:
     #         raise SearchError(f"Failed to search places: {str(e)}")
 
-    def search_places(self, query: str, filters: Optional[Dict] = None, k: int = 5) -> List[Document]:
-        """Search for relevant places with metadata filtering"""
+    def _place_document(self, index: PlacesVectorIndex, row_id: int) -> Document:
+        """Hydrate an index row into a Document"""
+        place = index.places.get(row_id)
+        return Document(page_content=PlacesEmbeddingsGenerator._render_content(place), metadata=place)
+
+    def _retrieve(self, index: PlacesVectorIndex, queries: List[str], metadata_filters: List[Dict],
+                  k: int) -> Tuple[List[List[Tuple[int, float]]], List[Optional[List[float]]]]:
+        """Hybrid lexical + vector retrieval of index rows for each query
+
+        Filters are applied by the index's prefilter before scoring, so every hit
+        satisfies them. A query that names a place is answered from the lexical index
+        alone; otherwise the vector ranking is fused with any lexical ranking. Also
+        returns the embedding of every query, None for queries answered lexically.
+        """
+        lexical = index.lexical
+        lexical_hits, hits, pending = [], [None] * len(queries), []
+        vectors = [None] * len(queries)
+        for position, (query, metadata_filter) in enumerate(zip(queries, metadata_filters)):
+            query_hits = []
+            if lexical.distinctive_tokens(tokenize(query)):
+                rows = index.prefilter.allowed_rows(metadata_filter)
+                query_hits = lexical.search(query, k=k, rows=rows)
+            lexical_hits.append(query_hits)
+            if query_hits and lexical.is_strong_match(query, query_hits[0][0]):
+                # The query names a place, no need to pay for an embedding
+                hits[position] = query_hits
+                self.retrieval_stats['lexical'] += 1
+            else:
+                pending.append(position)
+
+        if pending:
+            # embed_documents sends the queries in chunked bulk requests
+            query_vectors = self.embeddings.embed_documents([queries[position] for position in pending])
+            vector_hits = index.search_batch(
+                query_vectors, k=k, filters=[metadata_filters[position] for position in pending])
+            for position, query_vector, query_hits in zip(pending, query_vectors, vector_hits):
+                vectors[position] = query_vector
+                if lexical_hits[position]:
+                    hits[position] = reciprocal_rank_fusion([query_hits, lexical_hits[position]])[:k]
+                    self.retrieval_stats['hybrid'] += 1
+                else:
+                    hits[position] = query_hits
+                    self.retrieval_stats['vector'] += 1
+        return hits, vectors
+
+    def _metadata_filter(self, filters: Optional[Dict]) -> Dict:
+        # Types are matched loosely from the query, so they only steer the ranking
+        return {key: value for key, value in (filters or {}).items() if key != 'types'}
+
+    def search_places(self, query: str, filters: Optional[Dict] = None, k: int = 5, rank_by_rating: bool = False) -> List[Document]:
+        """Search for relevant places with metadata filtering
+
+        rank_by_rating ("best", "top" queries) retrieves a wider pool of relevant
+        places and keeps the ones ranked highest on the index's leaderboards.
+        """
         try:
-            # Prepare metadata filter dict
-            metadata_filter = {}
-            if filters:
-                for key, value in filters.items():
-                    if value is not None:
-                        if key == 'min_rating':
-                            # For min_rating, we'll still need post-processing as FAISS doesn't support range queries
-                            continue
-                        metadata_filter[key] = value
-            # remove types key from metadata_filter
-            if metadata_filter.get('types'):
-                metadata_filter.pop('types')
-
-            # Use FAISS's built-in metadata filtering
-            docs = self.vectorstore.similarity_search(
-                query,
-                k=k*2,  # Get more results initially since we might need to filter by rating
-                filter=metadata_filter if metadata_filter else None
-            )
-            # print(f"Found {docs} similar places")
-            # Post-process only for min_rating if needed
-            if filters and filters.get('min_rating'):
-                docs = [
-                    doc for doc in docs 
-                    if doc.metadata.get('rating', 0) >= filters['min_rating']
-                ]
-            
-            return docs[:k+2] if docs else []
+            # Pin the live index so a concurrent swap cannot change it mid request
+            return self._search(self.vectorstore, query, filters, k, rank_by_rating)[0]
+        except Exception as e:
+            print(traceback.format_exc(1))
+            raise SearchError(f"Failed to search places: {str(e)}")
+    
+    def _search(self, index: PlacesVectorIndex, query: str, filters: Optional[Dict], k: int,
+                rank_by_rating: bool) -> Tuple[List[Document], Optional[List[float]]]:
+        """search_places on a pinned index, also returning the query embedding if one was computed"""
+        pool = (k + 2) * (RATING_POOL_FACTOR if rank_by_rating else 1)
+        hits, vectors = self._retrieve(index, [query], [self._metadata_filter(filters)], k=pool)
+        hits = hits[0]
+        if rank_by_rating:
+            ranks = index.leaderboards.ranks
+            hits = sorted(hits, key=lambda hit: ranks[hit[0]])[:k + 2]
+        return [self._place_document(index, row_id) for row_id, _ in hits], vectors[0]
+
+    def search_places_batch(self, queries: List[str], filters_list: Optional[List[Optional[Dict]]] = None, k: int = 5) -> List[List[Document]]:
+        """Search for many queries at once: one bulk embedding call and one matrix search"""
+        try:
+            if filters_list is not None and len(filters_list) != len(queries):
+                raise ValueError("filters_list must have one entry per query")
+            if not queries:
+                return []
+            filters_list = filters_list or [None] * len(queries)
+            index = self.vectorstore
+            hits, _ = self._retrieve(index, queries, [self._metadata_filter(filters) for filters in filters_list], k=k)
+            return [[self._place_document(index, row_id) for row_id, _ in query_hits] for query_hits in hits]
+        except ValueError as ve:
+            print(traceback.format_exc(1))
+            raise RAGError(str(ve), "INVALID_INPUT")
         except Exception as e:
             print(traceback.format_exc(1))
             raise SearchError(f"Failed to search places: {str(e)}")
     
+    def _is_structured(self, index: PlacesVectorIndex, query: str, filters: Dict) -> bool:
+        """True when the filters say everything the query asks for"""
+        if not self.structured_answers or not (filters.get('city') or filters.get('main_category')):
+            return False
+        return index.filter_matcher.is_fully_matched(query, self.filter_min_confidence)
+
+    @staticmethod
+    def _place_response(place: Dict) -> PlaceResponse:
+        return PlaceResponse(
+            place_id=place['id'],
+            name=place['display_name'],
+            address=place['formatted_address'],
+            lat=place['lat'],
+            lng=place['lng'],
+            city=place['city'],
+            main_category=place['main_category'],
+            types=place['types'],
+            rating=place['rating'],
+            review_count=place['user_rating_count'])
+
+    def _structured_answer(self, index: PlacesVectorIndex, filters: Dict, n_places: int) -> Optional[QueryResponse]:
+        """Best rated places matching filters with a templated message
+
+        None when a types filter leaves fewer than n_places places, such queries
+        are left to the LLM.
+        """
+        places = [index.places.get(row_id) for row_id in structured_answer.top_rows(index, filters, n_places)]
+        if filters.get('types') and len(places) < n_places:
+            return None
+        return QueryResponse(
+            message=structured_answer.message(filters, places, n_places),
+            places=[self._place_response(place) for place in places],
+            applied_filters=filters,
+            filter_action="update")
+
+    async def _prepare_answer(self, query: str, n_places: int, session_id: Optional[UUID]) -> AnswerPlan:
+        """Filters, routing and retrieval shared by answer_query and stream_query"""
+        chat_history, last_filter = await self.get_chat_history(session_id)
+
+        current_filters = {}
+        
+        # Get current filters from last assistant message
+        if last_filter:
+            current_filters = last_filter[0]
+        else:
+            current_filters = {}
+        
+        # Pin the live index so a concurrent swap cannot change it mid request
+        index = self.vectorstore
+
+        # Process filters
+        filter_action = "clear" if self._should_clear_filters(query) else "update"
+        current_filters = {} if filter_action == "clear" else self._validate_and_extract_filters(query, current_filters, index)
+        
+        if filter_action != "clear" and self._is_structured(index, query, current_filters):
+            # e.g. "restaurants in Multan": rank from the place store, no embedding or LLM call
+            structured = self._structured_answer(index, current_filters, n_places)
+            if structured is not None:
+                self.routing_stats['structured'] += 1
+                return AnswerPlan(structured, [], current_filters, filter_action, {}, index.version)
+        self.routing_stats['llm'] += 1
+
+        # print(f"Searching for places with query: {query}")
+        # print(f"Current filters: {current_filters}")
+        # print(f"Chat history: {chat_history}")
+        # "best" / "top" / "highest rated" set min_rating
+        rank_by_rating = 'min_rating' in index.filter_matcher.resolve(query)
+        try:
+            # query_vector is None when the query was answered lexically, without an embedding
+            relevant_docs, query_vector = self._search(index, query, current_filters, n_places, rank_by_rating)
+        except Exception as e:
+            print(traceback.format_exc(1))
+            raise SearchError(f"Failed to search places: {str(e)}")
+        # print(f"Found {len(relevant_docs)} relevant places")
+        # print(f"relevent docs: {relevant_docs}")
+        inputs = self.prompt_inputs(query, relevant_docs, chat_history, current_filters, n_places)
+        return AnswerPlan(None, relevant_docs, current_filters, filter_action, inputs, index.version, query, query_vector)
+
+    @staticmethod
+    def prompt_inputs(query: str, relevant_docs: List[Document], chat_history: List, filters: Dict, n_places: int) -> Dict:
+        """Inputs of the response template"""
+        # context = "\n\n".join(doc.page_content for doc in relevant_docs) if relevant_docs else ""
+        context = "\n\n".join(json.dumps(doc.metadata) for doc in relevant_docs) if relevant_docs else "No places found"
+        return {
+            "context": context,
+            "query": query,
+            "chat_history": chat_history,
+            "current_filters": json.dumps(filters, indent=2),
+            "n_places": n_places,
+            # "format_instructions": self.output_parser.get_format_instructions()
+        }
+
+    def _hydrate(self, plan: AnswerPlan, answer: LLMAnswer, n_places: int) -> QueryResponse:
+        """QueryResponse with the full records of the places the LLM chose
+
+        Only ids of the relevant places the LLM was shown are accepted, so it can
+        neither invent a place nor alter its address, coordinates or rating.
+        """
+        candidates = {doc.metadata['id']: doc.metadata for doc in plan.relevant_docs}
+        chosen = list(dict.fromkeys(place_id for place_id in answer.place_ids if place_id in candidates))
+        self.llm_stats['unknown_place_ids'] += sum(place_id not in candidates for place_id in answer.place_ids)
+        return QueryResponse(
+            message=answer.message,
+            places=[self._place_response(candidates[place_id]) for place_id in chosen[:n_places]],
+            context=answer.context,
+            applied_filters=answer.applied_filters,
+            filter_action=answer.filter_action)
+
+    def _record_llm_call(self, message, seconds: float):
+        self.llm_stats['calls'] += 1
+        self.llm_stats['seconds'] += seconds
+        usage = getattr(message, 'usage_metadata', None) or {}
+        self.llm_stats['output_tokens'] += usage.get('output_tokens', 0)
+
+    def _cached_response(self, plan: AnswerPlan, n_places: int) -> Optional[Dict]:
+        if self.response_cache is None:
+            return None
+        place_ids = [doc.metadata['id'] for doc in plan.relevant_docs]
+        return self.response_cache.get(plan.index_version, plan.filters, place_ids, n_places, plan.query, plan.query_vector)
+
+    def _cache_response(self, plan: AnswerPlan, n_places: int, response: Dict, seconds: float):
+        if self.response_cache is None:
+            return
+        place_ids = [doc.metadata['id'] for doc in plan.relevant_docs]
+        self.response_cache.put(plan.index_version, plan.filters, place_ids, n_places, plan.query, plan.query_vector,
+                                response, seconds)
+
     async def answer_query(self, query: str,n_places: int = 5, session_id: Optional[UUID] = None) -> Tuple[QueryResponse, UUID]:
         """Process query and generate response"""
         try:
             if not query.strip():
                 raise ValueError("Query cannot be empty")
             
-            chat_history, last_filter = await self.get_chat_history(session_id)
-
-            current_filters = {}
-            
-            # Get current filters from last assistant message
-            if last_filter:
-                current_filters = last_filter[0]
-            else:
-                current_filters = {}
-            
-            # Process filters
-            filter_action = "clear" if self._should_clear_filters(query) else "update"
-            current_filters = {} if filter_action == "clear" else self._validate_and_extract_filters(query, current_filters)
-            
             # Search and generate response
             try:
-                # print(f"Searching for places with query: {query}")
-                # print(f"Current filters: {current_filters}")
-                # print(f"Chat history: {chat_history}")
-                relevant_docs = self.search_places(query=query,filters=current_filters, k=n_places)
-                # print(f"Found {len(relevant_docs)} relevant places")
-                # print(f"relevent docs: {relevant_docs}")
-                # context = "\n\n".join(doc.page_content for doc in relevant_docs) if relevant_docs else ""
-                
-                context = "\n\n".join(json.dumps(doc.metadata) for doc in relevant_docs) if relevant_docs else "No places found"
-                chain = self.response_template | self.llm | self.output_parser
-                response = await chain.ainvoke({
-                    "context": context,
-                    "query": query,
-                    "chat_history": chat_history,
-                    "current_filters": json.dumps(current_filters, indent=2),
-                    "n_places": n_places,
-                    # "format_instructions": self.output_parser.get_format_instructions()
-                })
+                plan = await self._prepare_answer(query, n_places, session_id)
+                if plan.structured is not None:
+                    return plan.structured.model_dump()
+                cached = self._cached_response(plan, n_places)
+                if cached is not None:
+                    return cached
+
+                started = time.perf_counter()
+                chain = self.response_template | self.llm
+                message = await chain.ainvoke(plan.inputs)
+                self._record_llm_call(message, time.perf_counter() - started)
+                answer = self.output_parser.parse(message.content)
+                response = self._hydrate(plan, answer, n_places).model_dump()
+                self._cache_response(plan, n_places, response, time.perf_counter() - started)
                 
-                return response.model_dump()
+                return response
                 
+            except DatabaseError:
+                raise
             except Exception as search_error:
                 print(traceback.format_exc(1))
                 raise SearchError(f"Failed to search or generate response: {str(search_error)}")
@@ -562,4 +931,51 @@ class RAGPipeline:
             raise RAGError(str(ve), "INVALID_INPUT")
         except Exception as e:
             print(traceback.format_exc(1))
-            raise ResponseGenerationError(f"Failed to process query: {str(e)}")
\ No newline at end of file
+            raise ResponseGenerationError(f"Failed to process query: {str(e)}")
+
+    async def stream_query(self, query: str, n_places: int = 5, session_id: Optional[UUID] = None) -> AsyncIterator[Tuple[str, Dict]]:
+        """Answer a query as a stream of (event, data) pairs
+
+        places - the retrieved places and the filters, before the LLM is called
+        token  - the next piece of the answer message, as the LLM generates it
+        done   - the complete QueryResponse, same as answer_query returns; its
+                 message is the one to keep
+
+        The LLM output is parsed as partial JSON while it streams, and every growth
+        of its "message" field is sent as a token. Structured queries (see
+        _is_structured) and cached answers send their message as a single token.
+        """
+        if not query or not query.strip():
+            raise RAGError("Query cannot be empty", "INVALID_INPUT")
+        plan = await self._prepare_answer(query, n_places, session_id)
+        ready = plan.structured.model_dump() if plan.structured is not None else self._cached_response(plan, n_places)
+        if ready is not None:
+            yield 'places', {'places': ready['places'], 'applied_filters': plan.filters, 'filter_action': plan.filter_action}
+            yield 'token', {'text': ready['message']}
+            yield 'done', ready
+            return
+
+        yield 'places', {'places': [self._place_response(doc.metadata).model_dump() for doc in plan.relevant_docs],
+                         'applied_filters': plan.filters, 'filter_action': plan.filter_action}
+        started = time.perf_counter()
+        chain = self.response_template | self.llm
+        sent, generated = '', None
+        try:
+            async for chunk in chain.astream(plan.inputs):
+                generated = chunk if generated is None else generated + chunk
+                try:
+                    partial = parse_json_markdown(generated.content)
+                except ValueError:
+                    continue
+                message = partial.get('message') if isinstance(partial, dict) else None
+                if isinstance(message, str) and len(message) > len(sent) and message.startswith(sent):
+                    yield 'token', {'text': message[len(sent):]}
+                    sent = message
+            self._record_llm_call(generated, time.perf_counter() - started)
+            answer = self.output_parser.parse(generated.content if generated is not None else '')
+            response = self._hydrate(plan, answer, n_places).model_dump()
+        except Exception as e:
+            print(traceback.format_exc(1))
+            raise ResponseGenerationError(f"Failed to generate response: {str(e)}")
+        self._cache_response(plan, n_places, response, time.perf_counter() - started)
+        yield 'done', response
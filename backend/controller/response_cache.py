@@ -0,0 +1,141 @@
+import copy
+import json
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def _filters_key(filters: Optional[Dict]) -> str:
+    """Order and case insensitive form of a filter dict, unset filters dropped"""
+    normalized = {
+        key: value.strip().casefold() if isinstance(value, str) else value
+        for key, value in (filters or {}).items() if value is not None and value != ''
+    }
+    return json.dumps(normalized, sort_keys=True, default=str)
+
+
+def _query_text(query: str) -> str:
+    return ' '.join(str(query).casefold().split())
+
+
+class SemanticResponseCache:
+    """Generated answers reused for near-identical questions
+
+    An answer is reused when a new query runs against the same index version, with
+    the same filters and number of places, retrieves exactly the same set of place
+    ids, and its embedding has a cosine similarity of at least threshold with the
+    cached query ("good hotels in Murree" / "nice hotels Murree"). The exact parts
+    form a bucket key, so similarity is only computed against the few entries of
+    one bucket. Queries retrieved without an embedding (a place named outright)
+    have no vector and only match the same query text, case and spacing aside.
+
+    Entries live in a bounded LRU with a TTL. The whole cache is dropped when the
+    index version changes, since a new version can rank and describe places
+    differently. Every hit saves the generation time recorded with its entry.
+    """
+    def __init__(self, max_size: int = 1000, ttl_seconds: float = 24 * 3600, threshold: float = 0.92):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        # entry id -> (created, bucket key, query text, unit query vector or None, response, generation seconds)
+        self._entries = OrderedDict()
+        self._buckets: Dict[Tuple, List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def _bucket(version: str, filters: Optional[Dict], place_ids: Iterable[str], n_places: int) -> Tuple:
+        return (version, _filters_key(filters), frozenset(place_ids), n_places)
+
+    @staticmethod
+    def _unit(vector) -> Optional[np.ndarray]:
+        if vector is None:
+            return None
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _check_version(self, version: str):
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._buckets.clear()
+            self.version = version
+
+    def _drop(self, entry_id: int):
+        _, bucket, _, _, _, _ = self._entries.pop(entry_id)
+        entry_ids = self._buckets[bucket]
+        entry_ids.remove(entry_id)
+        if not entry_ids:
+            del self._buckets[bucket]
+
+    def get(self, version: str, filters: Optional[Dict], place_ids: Iterable[str], n_places: int, query: str,
+            vector=None) -> Optional[Dict]:
+        """The cached response for this query, None on a miss"""
+        bucket = self._bucket(version, filters, place_ids, n_places)
+        text, unit = _query_text(query), self._unit(vector)
+        now = time.time()
+        with self._lock:
+            self._check_version(version)
+            best, best_similarity = None, self.threshold
+            for entry_id in list(self._buckets.get(bucket, ())):
+                created, _, cached_text, cached_unit, _, _ = self._entries[entry_id]
+                if now - created > self.ttl_seconds:
+                    self._drop(entry_id)
+                    continue
+                if unit is not None and cached_unit is not None:
+                    similarity = float(np.dot(unit, cached_unit))
+                else:
+                    similarity = 1.0 if text == cached_text else -1.0
+                if similarity >= best_similarity:
+                    best, best_similarity = entry_id, similarity
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            _, _, _, _, response, seconds = self._entries[best]
+            self.hits += 1
+            self.saved_seconds += seconds
+            return copy.deepcopy(response)
+
+    def put(self, version: str, filters: Optional[Dict], place_ids: Iterable[str], n_places: int, query: str, vector,
+            response: Dict, seconds: float):
+        """Remember a generated response and how long generating it took"""
+        if self.max_size <= 0:
+            return
+        bucket = self._bucket(version, filters, place_ids, n_places)
+        # The conversation context of one session does not carry over to another
+        response = {**copy.deepcopy(response), 'context': None}
+        with self._lock:
+            self._check_version(version)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (time.time(), bucket, _query_text(query), self._unit(vector), response, seconds)
+            self._buckets.setdefault(bucket, []).append(entry_id)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Counters for monitoring, every hit is an LLM generation saved"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'latency_saved_seconds': round(self.saved_seconds, 3),
+                'avg_latency_saved_ms': self.saved_seconds / self.hits * 1000 if self.hits else 0.0,
+            }
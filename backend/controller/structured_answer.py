@@ -0,0 +1,49 @@
+from typing import Dict, List
+from controller.vector_index import PlacesVectorIndex
+
+
+def top_rows(index: PlacesVectorIndex, filters: Dict, k: int) -> List[int]:
+    """Rows of the k best places matching filters, without any embedding or LLM call
+
+    Read from the index's precomputed leaderboards, so places are ranked by their
+    review-count adjusted rating (see controller.leaderboard) in O(k). With a types
+    filter only places carrying one of the types are returned.
+    """
+    return index.leaderboards.top(filters, k, index.places)
+
+
+def describe(filters: Dict) -> str:
+    """Filters in words, e.g. 'restaurants (cafe) in Multan rated 4.0 or higher'"""
+    category = filters.get('main_category')
+    text = str(category).lower() if category else 'places'
+    if filters.get('types') and str(filters['types']).lower() not in text:
+        # 'hotels (hotel)' says nothing new
+        text += f" ({filters['types']})"
+    if filters.get('city'):
+        text += f" in {filters['city']}"
+    if filters.get('min_rating') is not None:
+        text += f" rated {float(filters['min_rating']):.1f} or higher"
+    if filters.get('min_reviews') is not None:
+        text += f" with at least {int(filters['min_reviews'])} reviews"
+    return text
+
+
+def _shared_types(filters: Dict, places: List[Dict]) -> str:
+    """The filter's types that every one of places is tagged with"""
+    tags = [tag.strip() for tag in str(filters.get('types') or '').split(',') if tag.strip()]
+    place_tags = [{tag.strip().casefold() for tag in str(place.get('types') or '').split(',')} for place in places]
+    return ', '.join(tag for tag in tags if all(tag.casefold() in carried for carried in place_tags))
+
+
+def message(filters: Dict, places: List[Dict], requested: int) -> str:
+    """Templated summary of a structured answer
+
+    A type is only named when every place of the answer carries it.
+    """
+    description = describe({**filters, 'types': _shared_types(filters, places) if places else filters.get('types')})
+    found = len(places)
+    if not found:
+        return f"I couldn't find any {description}. Try another city or a broader category."
+    if found < requested:
+        return f"I found {found} {description}, ranked by rating and number of reviews."
+    return f"Here are the top {found} {description}, ranked by rating and number of reviews."
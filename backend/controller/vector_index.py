@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import shutil
+import numpy as np
+from collections import Counter
+from typing import List, Dict, Optional, Tuple
+from controller import EmbeddingsError
+from controller.place_store import PlaceStore
+from controller.prefilter import PlacePrefilter
+from controller.lexical_index import LexicalIndex
+from controller.filter_matcher import FilterMatcher
+from controller.leaderboard import Leaderboards
+from controller.quantization import CODECS, take_rows
+
+
+VECTORS_FILE = "vectors.npy"
+PLACES_DIR = "places"
+LEXICAL_DIR = "lexical"
+LEADERBOARDS_DIR = "leaderboards"
+MANIFEST_FILE = "manifest.json"
+STATS_FILE = "stats.json"
+
+# Keys the rows of an artifact are sorted by
+PARTITION_KEYS = ('city', 'main_category')
+
+
+def _partition_key(city: Optional[str], main_category: Optional[str]) -> Tuple[str, str]:
+    return (str(city or '').casefold(), str(main_category or '').casefold())
+
+
+class PlacesVectorIndex:
+    """Read-only places index backed by a memory-mapped embeddings matrix
+
+    Artifact layout (one directory per dataset):
+        vectors.npy  - row normalised float32 embeddings, opened with mmap_mode='r' so all
+                       workers on a host share the same page-cache pages instead of each
+                       unpickling a private copy
+        places/      - PlaceStore arrays, memory-mapped like the vectors, row i describes
+                       vector i
+        lexical/     - BM25 postings as CSR arrays, memory-mapped, see controller.lexical_index
+        leaderboards/ - places ranked by Bayesian rating per (city, main_category, type),
+                       see controller.leaderboard
+        manifest.json, stats.json - written by versioned builds (see build_index.py):
+                       dataset fingerprint, embedding model, codecs and build stats
+
+    Rows are stored sorted by (city, main_category), so every partition, and every city,
+    is a contiguous block of the matrix. Filters are resolved by a PlacePrefilter into an
+    allow-list of rows before scoring, so a filtered query scores only the matching rows
+    (without copying when they form a block) and always gets their exact top-k.
+
+    index_type selects how candidates are scored:
+        flat  - exact float32 inner product over the whole matrix
+        fp16 / sq8 / pq - a compressed codec (see controller.quantization) shortlists
+                rerank_factor * k rows, which are re-ranked exactly against vectors.npy,
+                so only the codes and the shortlisted rows need to be resident
+    """
+    def __init__(self, index_path: str, index_type: str = "flat", rerank_factor: int = 4):
+        if index_type != "flat" and index_type not in CODECS:
+            raise EmbeddingsError(f"Unknown index type: {index_type}")
+        # Milliseconds spent per open step, reported by benchmarks/startup.py
+        self.open_timings = {}
+        self._lap = time.perf_counter()
+        try:
+            self.index_path = index_path
+            self.index_type = index_type
+            self.rerank_factor = rerank_factor
+            self.vectors = np.load(os.path.join(index_path, VECTORS_FILE), mmap_mode='r')
+            self._time_step('vectors')
+            self.places = PlaceStore.load(os.path.join(index_path, PLACES_DIR))
+            self.manifest = self.read_manifest(index_path)
+            self._time_step('places')
+        except Exception as e:
+            raise EmbeddingsError(f"Failed to open places index at {index_path}: {str(e)}")
+        if self.vectors.shape[0] != len(self.places):
+            raise EmbeddingsError(
+                f"Places index at {index_path} is inconsistent: "
+                f"{self.vectors.shape[0]} vectors for {len(self.places)} places")
+        self.prefilter = PlacePrefilter(self.places)
+        self._time_step('prefilter')
+        try:
+            self.lexical = LexicalIndex.load(os.path.join(index_path, LEXICAL_DIR), self.places)
+        except Exception as e:
+            raise EmbeddingsError(f"Failed to open lexical index at {index_path}: {str(e)}")
+        self._time_step('lexical')
+        self.filter_matcher = FilterMatcher.from_places(self.places, document_count=self.lexical.document_count)
+        self._time_step('filters')
+        try:
+            self.leaderboards = Leaderboards.load(os.path.join(index_path, LEADERBOARDS_DIR))
+        except Exception as e:
+            raise EmbeddingsError(f"Failed to open leaderboards at {index_path}: {str(e)}")
+        self._time_step('leaderboards')
+        self.codec = None
+        if index_type != "flat":
+            if self.manifest and index_type not in self.manifest.get('codecs', []):
+                # Versioned artifacts are immutable, codes are only encoded at build time
+                raise EmbeddingsError(
+                    f"Places index {self.version} has no {index_type} codes, rebuild it with --codecs {index_type}")
+            try:
+                self.codec = CODECS[index_type](index_path).open()
+            except Exception as e:
+                raise EmbeddingsError(f"Failed to open {index_type} codes at {index_path}: {str(e)}")
+            self._time_step('codec')
+
+    def _time_step(self, name: str):
+        now = time.perf_counter()
+        self.open_timings[name] = round((now - self._lap) * 1000, 1)
+        self._lap = now
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def version(self) -> str:
+        return self.manifest.get('version') or os.path.basename(os.path.normpath(self.index_path))
+
+    @staticmethod
+    def read_manifest(index_path: str) -> Dict:
+        """manifest.json of an artifact, empty for artifacts built before versioning"""
+        path = os.path.join(index_path, MANIFEST_FILE)
+        if not os.path.isfile(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def exists(index_path: str) -> bool:
+        return (os.path.isfile(os.path.join(index_path, VECTORS_FILE))
+                and PlaceStore.exists(os.path.join(index_path, PLACES_DIR)))
+
+    @classmethod
+    def build(cls, index_path: str, vectors, places: PlaceStore, index_type: str = "flat", codecs=(),
+              manifest: Optional[Dict] = None, stats: Optional[Dict] = None, read_only: bool = False) -> "PlacesVectorIndex":
+        """Write a new artifact and open it.
+
+        Files are written to a private temporary directory which is renamed into place,
+        so a reader never sees a half written index. If another process published the
+        same artifact first its copy wins and ours is discarded. codecs are encoded up
+        front; a read_only artifact is chmod-ed so nothing can modify it after publishing.
+        Every place id must occur once, search returns rows without deduplicating them.
+        """
+        place_ids = places.column('id')
+        if len(set(place_ids)) != len(places):
+            duplicates = sorted({place_id for place_id, count in Counter(place_ids).items() if count > 1})
+            raise EmbeddingsError(
+                f"Cannot build places index: {len(duplicates)} duplicate place ids, e.g. {', '.join(duplicates[:3])}")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        keys = [_partition_key(*values) for values in zip(*(places.column(key) for key in PARTITION_KEYS))]
+        order = sorted(range(len(places)), key=keys.__getitem__)
+        vectors = vectors[order]
+        places = places.take(order)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        codecs = sorted(set(codecs) | ({index_type} - {"flat"}))
+        unknown = [name for name in codecs if name not in CODECS]
+        if unknown:
+            raise EmbeddingsError(f"Unknown index type: {', '.join(unknown)}")
+
+        tmp_path = f"{index_path}.tmp-{os.getpid()}"
+        os.makedirs(tmp_path, exist_ok=True)
+        try:
+            np.save(os.path.join(tmp_path, VECTORS_FILE), vectors)
+            places.save(os.path.join(tmp_path, PLACES_DIR))
+            LexicalIndex.build(places).save(os.path.join(tmp_path, LEXICAL_DIR))
+            leaderboards = Leaderboards.build(places)
+            leaderboards.save(os.path.join(tmp_path, LEADERBOARDS_DIR))
+            for name in codecs:
+                CODECS[name](tmp_path).build(vectors)
+            if manifest is not None:
+                manifest = {**manifest, 'rows': len(places), 'dimensions': int(vectors.shape[1]), 'codecs': codecs}
+                cls._write_json(os.path.join(tmp_path, MANIFEST_FILE), manifest)
+            if stats is not None:
+                stats = {**stats, 'leaderboards': len(leaderboards)}
+                cls._write_json(os.path.join(tmp_path, STATS_FILE), stats)
+            try:
+                os.rename(tmp_path, index_path)
+            except OSError:
+                if not cls.exists(index_path):
+                    raise
+            else:
+                if read_only:
+                    for directory, _, files in os.walk(index_path, topdown=False):
+                        for name in files:
+                            os.chmod(os.path.join(directory, name), 0o444)
+                        os.chmod(directory, 0o555)
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        return cls(index_path, index_type=index_type)
+
+    @staticmethod
+    def _write_json(path: str, data: Dict):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    def warm(self, block_size: int = 8192):
+        """Fault the vectors and codes into the page cache before the index takes traffic"""
+        arrays = [self.vectors] + ([self.codec.codes] if self.codec is not None else [])
+        for array in arrays:
+            for start in range(0, array.shape[0], block_size):
+                np.asarray(array[start:start + block_size]).sum()
+        if len(self):
+            self.search(np.ones(self.vectors.shape[1], dtype=np.float32), k=1)
+
+    def _top(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """Positions of the k highest scores, best first"""
+        n = min(k, scores.shape[0])
+        if n <= 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-scores, n - 1)[:n]
+        return top[np.argsort(-scores[top])]
+
+    def _allowed_rows(self, filter: Optional[Dict]) -> np.ndarray:
+        rows = self.prefilter.allowed_rows(filter)
+        return np.arange(len(self), dtype=np.int64) if rows is None else rows
+
+    def _search_rows(self, query: np.ndarray, rows: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if self.codec is not None and rows.size > k * self.rerank_factor:
+            # Shortlist on the compressed codes, then re-rank exactly
+            shortlist = rows[self._top(self.codec.score(query, rows), k * self.rerank_factor)]
+            rows = np.sort(shortlist)
+
+        scores = take_rows(self.vectors, rows) @ query
+        top = self._top(scores, k)
+        return [(int(rows[local]), float(scores[local])) for local in top]
+
+    def search(self, query_vector, k: int = 4, filter: Optional[Dict] = None) -> List[Tuple[int, float]]:
+        """Return (row_id, cosine similarity) pairs for the k nearest places matching the filter"""
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        return self._search_rows(query, self._allowed_rows(filter), k)
+
+    def search_batch(self, query_vectors, k: int = 4, filters: Optional[List[Optional[Dict]]] = None) -> List[List[Tuple[int, float]]]:
+        """search() for many queries, queries sharing a filter are scored with one matrix product"""
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(len(query_vectors), -1)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        filters = filters or [None] * len(queries)
+
+        groups = {}
+        for position, search_filter in enumerate(filters):
+            key = json.dumps(search_filter or {}, sort_keys=True, default=str)
+            groups.setdefault(key, []).append(position)
+
+        results = [None] * len(queries)
+        for positions in groups.values():
+            rows = self._allowed_rows(filters[positions[0]])
+            if self.codec is not None and rows.size > k * self.rerank_factor:
+                for position in positions:
+                    results[position] = self._search_rows(queries[position], rows, k)
+                continue
+            scores = take_rows(self.vectors, rows) @ queries[positions].T
+            for column, position in enumerate(positions):
+                top = self._top(scores[:, column], k)
+                results[position] = [(int(rows[local]), float(scores[local, column])) for local in top]
+        return results
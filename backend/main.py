@@ -1,5 +1,6 @@
 import os
 import sys
+from contextlib import asynccontextmanager
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from fastapi import FastAPI, Request
@@ -13,7 +14,7 @@ from pydantic import BaseModel
 from config import settings
 from controller import ErrorResponse, RAGError
 # from controller.database import Base, engine
-from routes import auth_router, session_router, chat_router
+from routes import auth_router, session_router, chat_router, rag_provider
 
 
 
@@ -27,8 +28,16 @@ def include_router(app_instance):
     app_instance.include_router(chat_router)
 
 
+@asynccontextmanager
+async def lifespan(app_instance: FastAPI):
+    # With RAG_BACKGROUND_LOAD the index loads while other routes already serve traffic
+    rag_provider.start(background=settings.RAG_BACKGROUND_LOAD)
+    yield
+    rag_provider.stop()
+
+
 def start_application():
-    app_instance = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION)
+    app_instance = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION, lifespan=lifespan)
     include_router(app_instance)
     # create_tables()  # new
     return app_instance
@@ -119,6 +128,20 @@ async def home():
         'detail': 'Welcome to the Travel Mate API'
     }
 
+@app.get('/ready')
+async def ready():
+    """Readiness probe, 503 until the places index is loaded"""
+    index_status = rag_provider.status()
+    return JSONResponse(
+        status_code=200 if index_status['ready'] else 503,
+        content={
+            'status_code': 200 if index_status['ready'] else 503,
+            'detail': 'Ready' if index_status['ready'] else 'Not Ready',
+            # Nothing about the host (index path, load errors) on an unauthenticated route
+            'data': {'state': index_status['state'], 'index_version': index_status.get('index_version')}
+        }
+    )
+
 # app.include_router(recipe_router)
 # app.include_router(food_router)
 # app.include_router(all_food_router)
@@ -1,3 +1,3 @@
 from routes.user_route import auth_router
 from routes.session_route import session_router
-from routes.chat_route import chat_router
\ No newline at end of file
+from routes.chat_route import chat_router, rag_provider
\ No newline at end of file
@@ -1,19 +1,50 @@
 from uuid import UUID
+import json
 import traceback
+from typing import TYPE_CHECKING
 
 from fastapi import APIRouter, status, Depends
-from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.exceptions import HTTPException
 from sqlalchemy.orm import Session
 
 from controller import deps
 from config import settings
-from controller import RAGPipeline, RAGError, SearchError, ResponseGenerationError, DatabaseError
+from controller import RAGError, SearchError, ResponseGenerationError, DatabaseError, PipelineNotReadyError
+from controller.pipeline_provider import RAGPipelineProvider
+from controller.database import Session as db_session
 from models import User, ChatSession, Message
-rag = RAGPipeline(
+from schema import BatchQueryRequest
+
+if TYPE_CHECKING:
+    from controller.rag import RAGPipeline
+
+# Built by the application lifespan (main.py), not at import
+rag_provider = RAGPipelineProvider(
             csv_path="controller/final_df.csv",
             openai_api_key=settings.OPENAI_API_KEY,
-            embeddings_dir="controller/embeddings")
+            embeddings_dir="controller/embeddings",
+            index_type=settings.INDEX_TYPE,
+            query_cache_size=settings.QUERY_CACHE_SIZE,
+            query_cache_ttl=settings.QUERY_CACHE_TTL,
+            query_cache_path=settings.QUERY_CACHE_PATH,
+            allow_index_build=settings.INDEX_BUILD_ON_START,
+            index_watch_interval=settings.INDEX_WATCH_INTERVAL,
+            index_drain_seconds=settings.INDEX_DRAIN_SECONDS,
+            filter_min_confidence=settings.FILTER_MIN_CONFIDENCE,
+            structured_answers=settings.STRUCTURED_ANSWERS,
+            response_cache_size=settings.RESPONSE_CACHE_SIZE,
+            response_cache_ttl=settings.RESPONSE_CACHE_TTL,
+            response_cache_similarity=settings.RESPONSE_CACHE_SIMILARITY)
+
+
+def get_rag() -> "RAGPipeline":
+    """The loaded pipeline, 503 while the index is still loading"""
+    try:
+        return rag_provider.get()
+    except PipelineNotReadyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=e.message)
 
 chat_router = APIRouter(
     prefix='/chat',
@@ -21,13 +52,44 @@ chat_router = APIRouter(
 
 )
 
+@chat_router.post('/query/batch', status_code=status.HTTP_200_OK, operation_id='authorize_chat_query_batch')
+def search_places_batch(
+    request: BatchQueryRequest,
+    user: User = Depends(deps.get_current_user),
+    rag=Depends(get_rag)):
+    """
+    Retrieve places for many queries in one call, without generating an answer
+
+    - **queries**: List[str] = User queries
+    - **filters**: List[dict] = Optional filters per query (city, main_category, min_rating, min_reviews)
+    - **k**: int = Number of places per query
+    - **header**:"Bearer _token_" = Authorization header with Bearer token as "Bearer <token>"
+
+    - **response**:
+    Returns the matching places for every query, in query order
+    """
+    try:
+        results = rag.search_places_batch(request.queries, request.filters, k=request.k)
+    except SearchError:
+        return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content='Cant find any places')
+    except RAGError as e:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content=e.message)
+    return {
+        'status_code': status.HTTP_200_OK,
+        'detail': 'Places Found',
+        'data': {
+            'results': [[doc.metadata for doc in docs] for docs in results]
+        }
+    }
+
 @chat_router.post('/query/{session_id}', status_code=status.HTTP_200_OK, operation_id='authorize_chat_query')
 async def add_message(
     session_id: UUID,
     query: str= None,
     max_places: int = 5,
     db: Session = Depends(deps.get_session),
-    user: User = Depends(deps.get_current_user)):
+    user: User = Depends(deps.get_current_user),
+    rag=Depends(get_rag)):
     """
     Chat with the assistant
 
@@ -80,6 +142,80 @@ async def add_message(
         print(traceback.format_exc(1))
         raise JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content="Unexpected Error")
     
+def _sse(event: str, data) -> str:
+    """One Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+@chat_router.post('/query/{session_id}/stream', status_code=status.HTTP_200_OK, operation_id='authorize_chat_query_stream')
+async def stream_message(
+    session_id: UUID,
+    query: str= None,
+    max_places: int = 5,
+    db: Session = Depends(deps.get_session),
+    user: User = Depends(deps.get_current_user),
+    rag=Depends(get_rag)):
+    """
+    Chat with the assistant, streamed as Server-Sent Events
+
+    - **session_id**:UUID = id of the chat session
+    - **query**: str = User query 
+    - **header**:"Bearer _token_" = Authorization header with Bearer token as "Bearer <token>"
+
+    - **response**:
+    text/event-stream with the events
+    - **places**: retrieved places and filters, sent before the answer is generated
+    - **token**: {"text": ...} next piece of the assistant message
+    - **done**: the saved assistant message, same as /chat/query returns
+    - **error**: {"detail": ...} the query failed, nothing was saved
+    """
+    if not db.query(ChatSession).filter(ChatSession.id == session_id).first():
+        return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content='Session not found')
+
+    async def events():
+        try:
+            async for event, data in rag.stream_query(query=query, session_id=session_id, n_places=max_places):
+                if event != 'done':
+                    yield _sse(event, data)
+                    continue
+                # The request's session is closed once the response starts, save with a new one
+                with db_session() as stream_db:
+                    stream_db.query(ChatSession).filter(ChatSession.id == session_id).first().update_activity()
+                    stream_db.add(Message(session_id=session_id, role="human", content={"message": query}))
+                    stream_db.flush()
+                    ai_message = Message(
+                        session_id=session_id,
+                        role="assistant",
+                        content={'message': data['message'], 'places': data['places']},
+                        applied_filters=data['applied_filters'],
+                        filter_action=data['filter_action']
+                        )
+                    stream_db.add(ai_message)
+                    stream_db.commit()
+                    stream_db.refresh(ai_message)
+                    yield _sse('done', {column.name: getattr(ai_message, column.name) for column in Message.__table__.columns})
+        except SearchError:
+            yield _sse('error', {'detail': 'Cant find any places'})
+        except RAGError:
+            yield _sse('error', {'detail': 'Failed to initialize System'})
+        except Exception:
+            print(traceback.format_exc(1))
+            yield _sse('error', {'detail': 'Some error occured on the server, Please check Account Quota'})
+
+    # X-Accel-Buffering: stop nginx from holding the events back until the stream ends
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@chat_router.get('/stats', status_code=status.HTTP_200_OK, operation_id='get_chat_stats')
+async def get_stats(
+    user: User = Depends(deps.get_current_user),
+    rag=Depends(get_rag)):
+    """Cache hit / miss counters of the retrieval pipeline"""
+    return {
+        'status_code': status.HTTP_200_OK,
+        'detail': 'Pipeline Stats',
+        'data': rag.stats()
+    }
+
 @chat_router.get('/history/{session_id}', status_code=status.HTTP_200_OK, operation_id='get_chat_history')
 async def get_chat_history(session_id: UUID, db: Session = Depends(deps.get_session)):
     """Get complete chat history with filters for a session"""
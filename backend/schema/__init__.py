@@ -1,2 +1,2 @@
-from schema.chat import MessageContent, ChatHistoryItem
+from schema.chat import MessageContent, ChatHistoryItem, BatchQueryRequest
 from schema.userSchema import UserSignUp, UserLogin, UserForget, UserUpdate
\ No newline at end of file
@@ -15,3 +15,9 @@ class ChatHistoryItem(BaseModel):
     role: str
     content: MessageContent
     timestamp: datetime
+
+class BatchQueryRequest(BaseModel):
+    """Body of a batch retrieval request"""
+    queries: List[str] = Field(..., min_length=1, max_length=1000)
+    filters: Optional[List[Optional[Dict[str, Any]]]] = None  # one filter dict (or null) per query
+    k: int = Field(default=5, ge=1, le=50)
@@ -143,12 +143,12 @@ const ChatWindow = () => {
         setIsFirstMessage(false); // Mark session update as done
       }
       const response = await fetch(
-        `${process.env.REACT_APP_BACKEND_URL}/chat/query/${selectedSessionId}?query=${encodeURIComponent(content)}&max_places=5`,
+        `${process.env.REACT_APP_BACKEND_URL}/chat/query/${selectedSessionId}/stream?query=${encodeURIComponent(content)}&max_places=5`,
         {
           method: 'POST',
           headers: {
             'Authorization': `Bearer ${user?.token}`,
-            'Accept': 'application/json',
+            'Accept': 'text/event-stream',
             'Content-Type': 'application/json',
           },
           body: JSON.stringify({}),
@@ -159,20 +159,51 @@ const ChatWindow = () => {
         throw new Error(`Error: ${response.statusText}`);
       }
 
-      const data = await response.json();
-
-      const { message, places } = data.content;
+      // Server-Sent Events: frames are separated by a blank line
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+      let buffer = '';
+      let streamed = '';
+      let started = false;
+      const showMessage = (text) => {
+        // Replace the assistant message being streamed instead of adding another one
+        const replace = started;
+        setMessages((prev) => {
+          const rest = replace ? prev.slice(0, -1) : prev;
+          return [...rest, { role: 'assistant', content: text }];
+        });
+        started = true;
+      };
 
-      setMessages((prev) => [
-        ...prev,
-        { role: 'assistant', content: message },
-        ...(places?.length
-          ? places.map((place) => ({
-              role: 'assistant',
-              content: <LocationCard key={place.place_id} place={place} />
-            }))
-          : []),
-      ]);
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += value;
+        const frames = buffer.split('\n\n');
+        buffer = frames.pop();
+        for (const frame of frames) {
+          const event = frame.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(frame.match(/^data: (.*)$/m)?.[1] ?? 'null');
+          if (event === 'token') {
+            streamed += data.text;
+            showMessage(streamed);
+            setIsLoading(false);
+          } else if (event === 'done') {
+            const { message, places } = data.content;
+            showMessage(message);
+            setMessages((prev) => [
+              ...prev,
+              ...(places?.length
+                ? places.map((place) => ({
+                    role: 'assistant',
+                    content: <LocationCard key={place.place_id} place={place} />
+                  }))
+                : []),
+            ]);
+          } else if (event === 'error') {
+            throw new Error(data.detail);
+          }
+        }
+      }
     } catch (error) {
       console.error("Error fetching response:", error);
       setMessages((prev) => [...prev, { role: 'assistant', content: "An error occurred. Please try again." }]);